@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+import typing
+
+import asyncpg
+import fastapi
+import starlette
+
+from app.config import DATABASE
+from app.db.auth import DENYLIST_CHANNEL, AuthRepository
+
+logger = logging.getLogger(__name__)
+
+# Number of seconds between purges of expired tokens
+PURGE_INTERVAL = 300
+# Number of seconds between attempts to restore a lost listening connection
+RECONNECT_INTERVAL = 1
+
+
+class TokenDenylist:
+    """In-memory copy of the denied tokens (app.token_denylist).
+
+    Tokens denied by any application worker are received using Postgres LISTEN/NOTIFY.
+    When the listening connection is lost, it is restored immediately; until the in-memory copy has been reloaded,
+    tokens are checked in the database.
+    Expired tokens are purged (both in memory and in the database) by a background task.
+    """
+
+    def __init__(self, pool: asyncpg.pool.Pool) -> None:
+        self._auth_repo = AuthRepository(pool)
+        # token -> expiration timestamp
+        self._tokens: typing.Dict[str, float] = {}
+        self._connection: typing.Optional[asyncpg.Connection] = None
+        # Whether the in-memory copy is complete and kept up to date
+        self._live = False
+        self._purge_task: typing.Optional[asyncio.Task] = None
+        self._reconnect_task: typing.Optional[asyncio.Task] = None
+
+    def _on_notification(self, _connection, _pid, _channel, payload: str) -> None:
+        (token, expires) = payload.rsplit("|", 1)
+        self._tokens[token] = float(expires)
+
+    def _on_termination(self, _connection) -> None:
+        self._live = False
+        self._start_reconnect()
+
+    async def _listen(self) -> None:
+        self._live = False
+        if self._connection is not None and not self._connection.is_closed():
+            self._connection.remove_termination_listener(self._on_termination)
+            self._connection.terminate()
+        self._connection = await asyncpg.connect(**DATABASE)
+        self._connection.add_termination_listener(self._on_termination)
+        # Start listening before loading, so no tokens can be missed
+        await self._connection.add_listener(DENYLIST_CHANNEL, self._on_notification)
+        for record in await self._auth_repo.denylist_get_tokens():
+            self._tokens[record["token"]] = record["expires"]
+        self._live = not self._connection.is_closed()
+
+    async def _reconnect(self) -> None:
+        while not self._live:
+            try:
+                await self._listen()
+            except Exception:
+                logger.exception("Token denylist reconnect failed")
+                await asyncio.sleep(RECONNECT_INTERVAL)
+
+    def _start_reconnect(self) -> None:
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    def _purge_memory(self) -> None:
+        now = time.time()
+        self._tokens = {
+            token: expires for token, expires in self._tokens.items() if expires >= now
+        }
+
+    async def _purge(self) -> None:
+        while True:
+            await asyncio.sleep(PURGE_INTERVAL)
+            try:
+                self._purge_memory()
+                await self._auth_repo.denylist_purge_expired_tokens()
+            except Exception:
+                logger.exception("Token denylist purge failed")
+
+    async def start(self) -> None:
+        await self._listen()
+        self._purge_task = asyncio.create_task(self._purge())
+
+    async def stop(self) -> None:
+        for task in [self._purge_task, self._reconnect_task]:
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self._connection is not None and not self._connection.is_closed():
+            self._connection.remove_termination_listener(self._on_termination)
+            await self._connection.close()
+
+    async def add(self, token: str, expiration_time: int) -> None:
+        await self._auth_repo.denylist_add_token(token, expiration_time)
+        # Don't wait for the notification to deny the token in this worker
+        self._tokens[token] = time.time() + expiration_time
+
+    async def is_denied(self, token: str) -> bool:
+        if token in self._tokens:
+            return True
+        if self._live and not self._connection.is_closed():
+            return False
+        # Notifications might have been missed, check the database until the in-memory copy has been restored
+        self._live = False
+        self._start_reconnect()
+        return not await self._auth_repo.denylist_check_token(token)
+
+
+async def denylist_connect(app: fastapi.FastAPI) -> None:
+    app.state.denylist = TokenDenylist(app.state.pool)
+    await app.state.denylist.start()
+
+
+async def denylist_disconnect(app: fastapi.FastAPI) -> None:
+    await app.state.denylist.stop()
+
+
+def get_denylist_from_request(request: starlette.requests.Request) -> TokenDenylist:
+    return request.app.state.denylist
@@ -1,7 +1,15 @@
+import collections
+import hashlib
+import json
+import time
+import typing
+
 import asyncpg
 
 from app.models.auth import User
 
+_MISSING = object()
+
 
 def no_arg_key_builder(func, _):
     return f"{func.__module__}|{func.__name__}"
@@ -35,9 +43,58 @@ def self_project_name_other_args_key_builder(func, self, *args, **kwargs):
     return f'{func.__module__}|{func.__name__}|{self._project_name}|{"|".join(str_args + str_kwargs)}'
 
 
-def get_permissions_key_builder(func, self, user: User):
-    return f"{func.__module__}|{func.__name__}|{user.id}"
-
-
-def create_schema_key_builder(func, self):
-    return f"{func.__module__}|{func.__name__}|{self._project_name}|{self._user.id}"
+def get_permissions_key_builder(func, self, user: User, config_version: str):
+    return f"{func.__module__}|{func.__name__}|{user.id}|{config_version}"
+
+
+def create_schema_key_builder(
+    func, self, config_version: str, permissions: typing.Dict = None
+):
+    key = f"{func.__module__}|{func.__name__}|{self._project_name}|{config_version}"
+    if permissions is None:
+        return key
+    # Users with the same effective permissions share a schema
+    permissions_hash = hashlib.sha1(
+        json.dumps(permissions, sort_keys=True).encode()
+    ).hexdigest()
+    return f"{key}|{permissions_hash}"
+
+
+class LRUCache:
+    """Bounded in-memory cache, evicting the least recently used entries first.
+
+    If a ttl (in seconds) is provided, entries also expire after this time.
+    """
+
+    def __init__(self, max_size: int, ttl: float = None) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        # key -> (expiration time, value)
+        self._data = collections.OrderedDict()
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        try:
+            (expires, value) = self._data[key]
+        except KeyError:
+            return default
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: typing.Hashable, value: typing.Any) -> None:
+        expires = None if self._ttl is None else time.monotonic() + self._ttl
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -3,24 +3,35 @@ import time
 import typing
 import uuid
 
-import asyncpg
 import elasticsearch
 import fastapi
 import rich.progress
 import starlette
 import typer
 
-from app.config import DATABASE, ELASTICSEARCH
-from app.es.base import BaseElasticsearch
+from app.config import ELASTICSEARCH
+from app.db.core import create_pool
+from app.es.pipeline import (
+    CONVERT_CONCURRENCY,
+    CONVERT_PROCESSES,
+    FETCH_CONCURRENCY,
+    SEND_CONCURRENCY,
+)
 from app.mgmt.config import ConfigManager
 from app.mgmt.data import DataManager
 from app.models.auth import UserWithPermissions
-from app.utils import BATCH_SIZE
 
 
-async def reindex(project_name: str, entity_type_names: typing.List[str] = None):
+async def reindex(
+    project_name: str,
+    entity_type_names: typing.List[str] = None,
+    fetch_concurrency: int = FETCH_CONCURRENCY,
+    convert_concurrency: int = CONVERT_CONCURRENCY,
+    send_concurrency: int = SEND_CONCURRENCY,
+    convert_processes: int = CONVERT_PROCESSES,
+):
     app = fastapi.FastAPI()
-    app.state.pool = await asyncpg.create_pool(**DATABASE)
+    app.state.pool = await create_pool()
     app.state.es = elasticsearch.AsyncElasticsearch(**ELASTICSEARCH)
 
     try:
@@ -61,45 +72,28 @@ async def reindex(project_name: str, entity_type_names: typing.List[str] = None)
             },
         )
 
-        es = BaseElasticsearch(app.state.es)
         data_manager = DataManager(request, user)
 
         for entity_type_name in entity_type_names:
-            entity_ids = await data_manager.get_entity_ids_by_type_name(
-                entity_type_name
-            )
-            entity_type_config = entity_types_config[entity_type_name]
-
-            es_data_config = entity_type_config["config"]["es_data"]["fields"]
-            new_index_name = await es.create_new_index(es_data_config)
-
-            async def index(entity_ids):
-                batch_entities = await data_manager.get_entity_data(
-                    batch_ids,
-                    BaseElasticsearch.extract_query_from_es_data_config(es_data_config),
-                    entity_type_name=entity_type_name,
-                )
+            total = await data_manager.count_entities_by_type_name(entity_type_name)
 
-                batch_docs = BaseElasticsearch.convert_entities_to_docs(
-                    entity_types_config, es_data_config, batch_entities
+            with rich.progress.Progress() as progress_bar:
+                task = progress_bar.add_task(
+                    f"Indexing {entity_type_name}", total=total
                 )
 
-                await es.add_bulk(new_index_name, batch_docs)
-
-            batch_counter = 0
-            batch_ids = []
-            for entity_id in rich.progress.track(
-                entity_ids, f"Indexing {entity_type_name}"
-            ):
-                batch_counter += 1
-                batch_ids.append(entity_id)
-                if not batch_counter % BATCH_SIZE:
-                    await index(batch_ids)
-                    batch_ids = []
-            if len(batch_ids):
-                await index(batch_ids)
-
-            await es.switch_to_new_index(new_index_name, entity_type_config["id"])
+                async def progress(count: int) -> None:
+                    progress_bar.advance(task, count)
+
+                await data_manager.es_reindex(
+                    entity_type_name,
+                    data_manager.iter_entity_ids_by_type_name(entity_type_name),
+                    progress,
+                    fetch_concurrency=fetch_concurrency,
+                    convert_concurrency=convert_concurrency,
+                    send_concurrency=send_concurrency,
+                    convert_processes=convert_processes,
+                )
     finally:
         await app.state.pool.close()
         await app.state.es.close()
@@ -114,10 +108,34 @@ def main(
     entity_type_names: typing.List[str] = typer.Option(
         None, help="Names of entity types to be reindexed"
     ),
+    fetch_concurrency: int = typer.Option(
+        FETCH_CONCURRENCY,
+        help="Number of batches fetched from the database in parallel",
+    ),
+    convert_concurrency: int = typer.Option(
+        CONVERT_CONCURRENCY, help="Number of batches converted in parallel"
+    ),
+    send_concurrency: int = typer.Option(
+        SEND_CONCURRENCY,
+        help="Number of bulk requests sent to Elasticsearch in parallel",
+    ),
+    convert_processes: int = typer.Option(
+        CONVERT_PROCESSES,
+        help="Number of worker processes converting entities to documents (0 to convert in the main process)",
+    ),
 ):
     start_time = time.time()
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(reindex(project_name, entity_type_names))
+    loop.run_until_complete(
+        reindex(
+            project_name,
+            entity_type_names,
+            fetch_concurrency,
+            convert_concurrency,
+            send_concurrency,
+            convert_processes,
+        )
+    )
     loop.close()
     print(f"Total time: {time.time() - start_time}")
 
@@ -1,8 +1,13 @@
 import typing
 
+import asyncpg
+
 from app.db.base import BaseRepository
 from app.models.auth import User, UserWithHashedPassword
 
+# Postgres notification channel used to broadcast denied tokens
+DENYLIST_CHANNEL = "token_denylist"
+
 
 class AuthRepository(BaseRepository):
     async def get_user(self, username: str) -> typing.Optional[User]:
@@ -66,23 +71,47 @@ class AuthRepository(BaseRepository):
         return [str(record["group_id"]) for record in records]
 
     async def denylist_add_token(self, token, expiration_time) -> None:
+        # Notify all application workers, so they can update their in-memory denylist
         await self.execute(
             """
-                INSERT INTO app.token_denylist (token, expires)
-                VALUES (:token, NOW() + INTERVAL '1 SECOND' * :expiration_time );
+                WITH token AS (
+                    INSERT INTO app.token_denylist (token, expires)
+                    VALUES (:token, NOW() + INTERVAL '1 SECOND' * :expiration_time )
+                    RETURNING token_denylist.token, token_denylist.expires
+                )
+                SELECT pg_notify(
+                    :channel,
+                    token.token || '|' || extract(epoch FROM token.expires)::text
+                )
+                FROM token;
             """,
             {
                 "token": token,
                 "expiration_time": expiration_time,
+                "channel": DENYLIST_CHANNEL,
             },
         )
 
+    async def denylist_get_tokens(
+        self, connection: asyncpg.Connection = None
+    ) -> typing.List[asyncpg.Record]:
+        return await self.fetch(
+            """
+                SELECT
+                    token_denylist.token::text,
+                    extract(epoch FROM token_denylist.expires)::float AS expires
+                FROM app.token_denylist
+                WHERE token_denylist.expires >= now();
+            """,
+            connection=connection,
+        )
+
     async def denylist_purge_expired_tokens(self) -> None:
         await self.execute(
             """
                 DELETE
                 FROM app.token_denylist
-                WHERE token_denylist.expires > now();
+                WHERE token_denylist.expires < now();
             """
         )
 
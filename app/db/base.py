@@ -1,3 +1,4 @@
+import functools
 import typing
 import uuid
 from contextlib import asynccontextmanager
@@ -12,10 +13,41 @@ from app.exceptions import InvalidUUIdException
 RENDERER = buildpg.Renderer(regex=r"(?<![a-z\\:]):([a-z][a-z0-9_]*)")
 
 
+class Connection(asyncpg.connection.Connection):
+    """Connection keeping track of whether the Apache AGE library has been loaded."""
+
+    age_loaded = False
+
+
 class BaseRepository:
     def __init__(self, pool: asyncpg.pool.Pool) -> None:
         self._pool = pool
 
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _compile(query_template: str) -> typing.Tuple[str, typing.Tuple[str]]:
+        """Convert named placeholders to native PostgreSQL syntax once for each query template.
+
+        Query templates include the project and type ids, so a template identifies a query kind for a specific
+        (project, type) combination.
+
+        Args:
+            query_template (str): Query with named placeholders.
+
+        Returns:
+            typing.Tuple[str, typing.Tuple[str]]: The query in native PostgreSQL syntax and the names of the parameters
+                in the order of the corresponding query arguments.
+        """
+        param_names = []
+        for match in RENDERER.regex.finditer(query_template):
+            if match.group(1) not in param_names:
+                param_names.append(match.group(1))
+
+        query, _ = RENDERER(query_template, **{name: None for name in param_names})
+        query = query.replace("\\:", ":")
+
+        return (query, tuple(param_names))
+
     @staticmethod
     def _render(
         query_template: str,
@@ -30,33 +62,37 @@ class BaseRepository:
         Returns:
             typing.List[str, typing.List]: The query in native PostgreSQL syntax and the corresponding query arguments.
         """
+        query, param_names = BaseRepository._compile(query_template)
         if params is None:
-            query, args = RENDERER(query_template)
-        else:
-            query, args = RENDERER(query_template, **params)
+            params = {}
 
-        query = query.replace("\\:", ":")
+        try:
+            args = [params[name] for name in param_names]
+        except KeyError as e:
+            raise buildpg.BuildError(
+                f'variable "{e.args[0]}" not found in context'
+            ) from None
 
         return [query, args]
 
-    # TODO: only initialize age once (e.g., by subclassing asyncpg.connection.Connection and adding an attribute)
     @staticmethod
     async def _init_age(connection: asyncpg.connection.Connection) -> None:
-        """Set ag_catalog as search_path and load the Apache AGE library file.
+        """Load the Apache AGE library file (once per connection).
+
+        The search_path (including ag_catalog, e.g. for the graphid operators) is set as a server setting of the
+        connection by create_pool, so it is not reset when a connection is released to the pool.
 
         Args:
-            connection: The connection (on which a transaction block is active).
+            connection: The connection.
         """
-        await connection.execute(
-            """
-                SET search_path = ag_catalog;
-            """
-        )
         await connection.execute(
             """
                 LOAD '$libdir/plugins/age';
             """
         )
+        # Connections handed out by a pool are proxies, which forward reading (but not setting) attributes
+        if isinstance(connection, Connection):
+            connection.age_loaded = True
 
     @staticmethod
     def _check_valid_label(uuid_to_test, version=4) -> None:
@@ -92,6 +128,38 @@ class BaseRepository:
     async def fetchval(self, *args, **kwargs):
         return await self._db_call("fetchval", *args, **kwargs)
 
+    async def copy_records_to_table(
+        self,
+        table_name: str,
+        records: typing.Iterable[typing.Sequence],
+        columns: typing.Sequence[str],
+        schema_name: str = None,
+        connection: asyncpg.connection.Connection = None,
+    ) -> str:
+        """Insert records using the COPY protocol (no query rendering or statement per record).
+
+        Args:
+            table_name (str): Name of the table (unquoted).
+            records (typing.Iterable[typing.Sequence]): Records, with values in the order of the columns.
+            columns (typing.Sequence[str]): Column names.
+            schema_name (str, optional): Name of the schema of the table (unquoted).
+            connection (asyncpg.connection.Connection, optional):
+        """
+        if connection is None:
+            async with self._pool.acquire() as connection:
+                return await connection.copy_records_to_table(
+                    table_name,
+                    records=records,
+                    columns=columns,
+                    schema_name=schema_name,
+                )
+        return await connection.copy_records_to_table(
+            table_name,
+            records=records,
+            columns=columns,
+            schema_name=schema_name,
+        )
+
     async def _db_call(
         self,
         method: str,
@@ -114,7 +182,7 @@ class BaseRepository:
             connection (asyncpg.connection.Connection, optional):
         """
         if method == "executemany":
-            query, _ = self.__class__._render(query_template, params[0])
+            query, _ = self.__class__._compile(query_template)
             # Additional list to allow unpack operation when calling the corresponding asyncpg method
             args = [[self.__class__._render(query_template, p)[1] for p in params]]
         else:
@@ -122,16 +190,10 @@ class BaseRepository:
 
         if connection is None:
             async with self._pool.acquire() as connection:
-                if age:
-                    async with connection.transaction():
-                        await self.__class__._init_age(connection)
-                        return await getattr(connection, method)(query, *args)
-                else:
-                    return await getattr(connection, method)(query, *args)
-        else:
-            if age:
-                async with connection.transaction():
+                if age and not getattr(connection, "age_loaded", False):
                     await self.__class__._init_age(connection)
-                    return await getattr(connection, method)(query, *args)
-            else:
                 return await getattr(connection, method)(query, *args)
+        else:
+            if age and not getattr(connection, "age_loaded", False):
+                await self.__class__._init_age(connection)
+            return await getattr(connection, method)(query, *args)
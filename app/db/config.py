@@ -20,6 +20,38 @@ class ConfigRepository(BaseRepository):
             connection=connection,
         )
 
+    async def get_config_version(
+        self,
+        project_name: str,
+        connection: asyncpg.Connection = None,
+    ) -> str:
+        # Entity and relation type configs are updated by adding revisions
+        return await self.fetchval(
+            """
+                SELECT concat_ws(
+                    '|',
+                    (
+                        SELECT count(*) || ':' || coalesce(max(entity_revision.created)::text, '')
+                        FROM app.entity_revision
+                        INNER JOIN app.entity ON entity_revision.entity_id = entity.id
+                        INNER JOIN app.project ON entity.project_id = project.id
+                        WHERE project.system_name = :project_name
+                    ),
+                    (
+                        SELECT count(*) || ':' || coalesce(max(relation_revision.created)::text, '')
+                        FROM app.relation_revision
+                        INNER JOIN app.relation ON relation_revision.relation_id = relation.id
+                        INNER JOIN app.project ON relation.project_id = project.id
+                        WHERE project.system_name = :project_name
+                    )
+                );
+            """,
+            {
+                "project_name": project_name,
+            },
+            connection=connection,
+        )
+
     async def get_entity_types_config(
         self,
         project_name: str,
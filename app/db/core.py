@@ -3,12 +3,41 @@ import typing
 import asyncpg
 import fastapi
 import starlette
+
 from app.config import DATABASE
-from app.db.base import BaseRepository
+from app.db.base import BaseRepository, Connection
+
+STATEMENT_CACHE_SIZE = 2048
+# Apache AGE operators (e.g., graphid comparisons in plain SQL joins) are defined in ag_catalog
+SEARCH_PATH = 'ag_catalog, "$user", public'
+
+
+async def init_connection(connection: Connection) -> None:
+    # Load Apache AGE once for each new connection in the pool
+    await BaseRepository._init_age(connection)
+
+
+async def create_pool() -> asyncpg.pool.Pool:
+    return await asyncpg.create_pool(
+        **{
+            # Queries are generated per project and per entity or relation type.
+            # Keep the prepared statements for all of them on each connection, so Postgres only plans them once.
+            "statement_cache_size": STATEMENT_CACHE_SIZE,
+            "max_cached_statement_lifetime": 0,
+            **DATABASE,
+            # A server setting (instead of SET in init) is kept when the pool resets a released connection
+            "server_settings": {
+                **DATABASE.get("server_settings", {}),
+                "search_path": SEARCH_PATH,
+            },
+        },
+        connection_class=Connection,
+        init=init_connection,
+    )
 
 
 async def db_connect(app: fastapi.FastAPI) -> None:
-    app.state.pool = await asyncpg.create_pool(**DATABASE)
+    app.state.pool = await create_pool()
 
 
 async def db_disconnect(app: fastapi.FastAPI) -> None:
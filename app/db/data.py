@@ -9,7 +9,7 @@ import asyncpg
 from app.cache.core import skip_self_connection_key_builder
 from app.db.base import BaseRepository
 from app.db.config import ConfigRepository
-from app.utils import dtu, relation_label, utd
+from app.utils import BATCH_SIZE, dtu, relation_label, utd
 
 
 class DataRepository(BaseRepository):
@@ -28,41 +28,61 @@ class DataRepository(BaseRepository):
     ) -> str:
         """
         Get the entity or relation type id from a graph id.
+        See get_type_ids_from_graph_ids.
+        """
+        return (
+            await self.get_type_ids_from_graph_ids(
+                project_id, [graph_id], connection=connection
+            )
+        )[0]
+
+    async def get_type_ids_from_graph_ids(
+        self,
+        project_id: str,
+        graph_ids: typing.Iterable[str],
+        connection: asyncpg.connection.Connection = None,
+    ) -> typing.List[str]:
+        """
+        Get the entity or relation type ids from a list of graph ids.
         This data can be retrieved from the name column in the ag_catalog.ag_label table by using the id column.
         The value from this id column can be retrieved from the graph_id by doing a right bitshift by (32+16) places.
-        The actual lookup is performed in get_type_id_by_label_id so it can be cached.
+        The label ids of a project are loaded at once (see _get_type_ids_by_label_id), so only a dict lookup per graph
+        id is required.
         """
-        return await self._get_type_id_by_label_id(
-            project_id,
-            int(graph_id) >> (32 + 16),
-            connection,
+        label_ids = [int(graph_id) >> (32 + 16) for graph_id in graph_ids]
+        type_ids_by_label_id = await self._get_type_ids_by_label_id(
+            project_id, connection=connection
         )
+        if not all(label_id in type_ids_by_label_id for label_id in label_ids):
+            # A label might have been added (new entity or relation type) => reload
+            type_ids_by_label_id = await self._get_type_ids_by_label_id(
+                project_id, connection=connection, cache_read=False
+            )
+        return [type_ids_by_label_id[label_id] for label_id in label_ids]
 
     @aiocache.cached(key_builder=skip_self_connection_key_builder)
-    async def _get_type_id_by_label_id(
+    async def _get_type_ids_by_label_id(
         self,
         project_id: str,
-        label_id: int,
         connection: asyncpg.connection.Connection = None,
-    ) -> str:
+    ) -> typing.Dict[int, str]:
         graph_id = await self._get_graph_id(project_id, connection)
-        raw_type_id = await self.fetchval(
-            (
-                "SELECT name "
-                "FROM ag_label "
-                "WHERE graph = :graph_id AND id = :label_id;"
-            ),
+        records = await self.fetch(
+            ("SELECT id, name " "FROM ag_catalog.ag_label " "WHERE graph = :graph_id;"),
             {
                 "graph_id": graph_id,
-                "label_id": label_id,
             },
             age=True,
             connection=connection,
         )
-        if raw_type_id == "_source_":
-            return raw_type_id
-        # n_uuid or e_uuid
-        return utd(raw_type_id[2:])
+        results = {}
+        for record in records:
+            if record["name"] == "_source_":
+                results[record["id"]] = record["name"]
+            # n_uuid or e_uuid
+            elif record["name"][:2] in ["n_", "e_"]:
+                results[record["id"]] = utd(record["name"][2:])
+        return results
 
     @aiocache.cached(key_builder=skip_self_connection_key_builder)
     async def _get_graph_id(
@@ -72,7 +92,11 @@ class DataRepository(BaseRepository):
     ) -> str:
         self.__class__._check_valid_label(project_id)
         return await self.fetchval(
-            ("SELECT graph " "FROM ag_label " "WHERE relation = :relation::regclass;"),
+            (
+                "SELECT graph "
+                "FROM ag_catalog.ag_label "
+                "WHERE relation = :relation::regclass;"
+            ),
             {"relation": f'"{project_id}"._ag_label_vertex'},
             age=True,
             connection=connection,
@@ -153,11 +177,11 @@ class DataRepository(BaseRepository):
                 create_clause = ", ".join([f"{k}:${k}" for k in clean_input.keys()])
 
                 query = (
-                    f"SELECT * FROM cypher("
+                    f"SELECT * FROM ag_catalog.cypher("
                     f"'{project_id}', "
                     f"$$CREATE (n:n_{dtu(entity_type_id)} {{{create_clause}}}) "
                     f"RETURN n$$, :params"
-                    f") as (n agtype);"
+                    f") as (n ag_catalog.agtype);"
                 )
 
                 record = await self.fetchval(
@@ -217,13 +241,13 @@ class DataRepository(BaseRepository):
             remove_clause = "".join(f"REMOVE n.{k} " for k in remove)
 
         query = (
-            f"SELECT * FROM cypher("
+            f"SELECT * FROM ag_catalog.cypher("
             f"'{project_id}', "
             f"$$MATCH (n:n_{dtu(entity_type_id)} {{id: $entity_id}}) "
             f"{set_clause}"
             f"{remove_clause}"
             f"RETURN n$$, :params"
-            f") as (n agtype);"
+            f") as (n ag_catalog.agtype);"
         )
 
         record = await self.fetchrow(
@@ -330,12 +354,12 @@ class DataRepository(BaseRepository):
         ):
             async with inner_connection.transaction():
                 query = (
-                    f"SELECT * FROM cypher("
+                    f"SELECT * FROM ag_catalog.cypher("
                     f"'{project_id}', "
                     f"$$MATCH (n:n_{dtu(entity_type_id)} {{id: $entity_id}}) "
                     f"DELETE n "
                     f"RETURN n$$, :params"
-                    f") as (n agtype);"
+                    f") as (n ag_catalog.agtype);"
                 )
 
                 # Delete relation entity to enable source relations
@@ -374,21 +398,17 @@ class DataRepository(BaseRepository):
             async with self.connection() as new_connection:
                 return await execute_in_transaction(new_connection)
 
-    async def get_relations_from_start_entities(
-        self,
+    @staticmethod
+    def _relations_from_start_entities_query(
         project_id: str,
         entity_type_id: str,
-        entity_ids: typing.List[int],
         relation_type_id: str,
-        inverse: bool = False,
-        connection: asyncpg.Connection = None,
-    ) -> typing.List[asyncpg.Record]:
-        self.__class__._check_valid_label(project_id)
-        self.__class__._check_valid_label(entity_type_id)
-        self.__class__._check_valid_label(relation_type_id)
+        inverse: bool,
+        entity_ids_param: str = "entity_ids",
+    ) -> str:
         # TODO: use cypher query when property indices are available (https://github.com/apache/incubator-age/issues/45)
         if inverse:
-            query = (
+            return (
                 f"SELECT ri.id, e.properties as e_properties, n.id as n_id, n.properties as n_properties "
                 f'FROM "{project_id}".n_{dtu(entity_type_id)} r '
                 f'INNER JOIN "{project_id}"._i_n_{dtu(entity_type_id)} ri '
@@ -397,22 +417,40 @@ class DataRepository(BaseRepository):
                 f"ON r.id = e.end_id "
                 f'INNER JOIN "{project_id}"._ag_label_vertex n '
                 f"ON e.start_id = n.id "
-                f"WHERE ri.id = ANY(:entity_ids);"
-            )
-        else:
-            query = (
-                f"SELECT di.id, e.properties as e_properties, n.id as n_id, n.properties as n_properties "
-                f'FROM "{project_id}".n_{dtu(entity_type_id)} d '
-                f'INNER JOIN "{project_id}"._i_n_{dtu(entity_type_id)} di '
-                f"ON d.id = di.nid "
-                f'INNER JOIN "{project_id}".{relation_label(relation_type_id)} e '
-                f"ON d.id = e.start_id "
-                f'INNER JOIN "{project_id}"._ag_label_vertex n '
-                f"ON e.end_id = n.id "
-                f"WHERE di.id = ANY(:entity_ids);"
+                f"WHERE ri.id = ANY(:{entity_ids_param})"
             )
+        return (
+            f"SELECT di.id, e.properties as e_properties, n.id as n_id, n.properties as n_properties "
+            f'FROM "{project_id}".n_{dtu(entity_type_id)} d '
+            f'INNER JOIN "{project_id}"._i_n_{dtu(entity_type_id)} di '
+            f"ON d.id = di.nid "
+            f'INNER JOIN "{project_id}".{relation_label(relation_type_id)} e '
+            f"ON d.id = e.start_id "
+            f'INNER JOIN "{project_id}"._ag_label_vertex n '
+            f"ON e.end_id = n.id "
+            f"WHERE di.id = ANY(:{entity_ids_param})"
+        )
+
+    async def get_relations_from_start_entities(
+        self,
+        project_id: str,
+        entity_type_id: str,
+        entity_ids: typing.List[int],
+        relation_type_id: str,
+        inverse: bool = False,
+        connection: asyncpg.Connection = None,
+    ) -> typing.List[asyncpg.Record]:
+        self.__class__._check_valid_label(project_id)
+        self.__class__._check_valid_label(entity_type_id)
+        self.__class__._check_valid_label(relation_type_id)
+        query = self.__class__._relations_from_start_entities_query(
+            project_id,
+            entity_type_id,
+            relation_type_id,
+            inverse,
+        )
         records = await self.fetch(
-            query,
+            f"{query};",
             {
                 "entity_ids": entity_ids,
             },
@@ -422,6 +460,53 @@ class DataRepository(BaseRepository):
 
         return records
 
+    async def get_relations_from_start_entities_batch(
+        self,
+        project_id: str,
+        branches: typing.List[typing.Tuple[str, typing.List[int], str, bool]],
+        connection: asyncpg.Connection = None,
+    ) -> typing.List[typing.List[asyncpg.Record]]:
+        """Get relations for multiple (entity_type_id, entity_ids, relation_type_id, inverse) branches at once.
+
+        All branches are combined in a single UNION ALL query, so only one round trip is required.
+
+        Returns:
+            typing.List[typing.List[asyncpg.Record]]: The records for each of the branches (in the same order).
+        """
+        self.__class__._check_valid_label(project_id)
+        if not branches:
+            return []
+
+        queries = []
+        params = {}
+        for i, (entity_type_id, entity_ids, relation_type_id, inverse) in enumerate(
+            branches
+        ):
+            self.__class__._check_valid_label(entity_type_id)
+            self.__class__._check_valid_label(relation_type_id)
+            query = self.__class__._relations_from_start_entities_query(
+                project_id,
+                entity_type_id,
+                relation_type_id,
+                inverse,
+                f"entity_ids_{i}",
+            )
+            # Add the branch index so records can be assigned to the right branch
+            queries.append(query.replace("SELECT ", f"SELECT {i} as branch, ", 1))
+            params[f"entity_ids_{i}"] = entity_ids
+
+        records = await self.fetch(
+            f"{' UNION ALL '.join(queries)};",
+            params,
+            age=True,
+            connection=connection,
+        )
+
+        results = [[] for _ in branches]
+        for record in records:
+            results[record["branch"]].append(record)
+        return results
+
     async def get_all_entity_relations(
         self,
         project_id: str,
@@ -494,11 +579,11 @@ class DataRepository(BaseRepository):
         self.__class__._check_valid_label(relation_type_id)
 
         query = (
-            f"SELECT * FROM cypher("
+            f"SELECT * FROM ag_catalog.cypher("
             f"'{project_id}', "
             f"$$MATCH ()-[e:e_{dtu(relation_type_id)} {{id: $relation_id}}]->() "
             f"RETURN e$$, :params"
-            f") as (e agtype);"
+            f") as (e ag_catalog.agtype);"
         )
         record = await self.fetchval(
             query,
@@ -534,12 +619,12 @@ class DataRepository(BaseRepository):
         self.__class__._check_valid_label(relation_type_id)
 
         query = (
-            f"SELECT * FROM cypher("
+            f"SELECT * FROM ag_catalog.cypher("
             f"'{project_id}', "
             f"$$MATCH (en:en_{dtu(relation_type_id)} {{id: $relation_id}})-[e:_source_]->(s) "
             f"DELETE e "
             f"RETURN e, s$$, :params"
-            f") as (e agtype, s agtype);"
+            f") as (e ag_catalog.agtype, s ag_catalog.agtype);"
         )
         records = await self.fetch(
             query,
@@ -594,13 +679,13 @@ class DataRepository(BaseRepository):
                 create_clause = ", ".join([f"{k}:${k}" for k in clean_input.keys()])
 
                 query = (
-                    f"SELECT * FROM cypher("
+                    f"SELECT * FROM ag_catalog.cypher("
                     f"'{project_id}', "
                     f"$$MATCH (d:n_{dtu(start_entity_type_id)} {{id: $start_entity_id}}), "
                     f"(r:n_{dtu(end_entity_type_id)} {{id: $end_entity_id}}) "
                     f"CREATE (d)-[e:e_{dtu(relation_type_id)} {{{create_clause}}}]->(r) "
                     f"RETURN d, e, r$$, :params"
-                    f") as (d agtype, e agtype, r agtype);"
+                    f") as (d ag_catalog.agtype, e ag_catalog.agtype, r ag_catalog.agtype);"
                 )
 
                 record = await self.fetchrow(
@@ -623,11 +708,11 @@ class DataRepository(BaseRepository):
                 parsed_record = json.loads(record["e"][:-6])
                 relation_entity_record = await self.fetchval(
                     (
-                        f"SELECT * FROM cypher("
+                        f"SELECT * FROM ag_catalog.cypher("
                         f"'{project_id}', "
                         f"$$CREATE (en:en_{dtu(relation_type_id)} {{id: $id}}) "
                         f"RETURN en$$, :params"
-                        f") as (en agtype);"
+                        f") as (en ag_catalog.agtype);"
                     ),
                     {
                         "params": json.dumps(
@@ -690,13 +775,13 @@ class DataRepository(BaseRepository):
             remove_clause = "".join(f"REMOVE e.{k} " for k in remove)
 
         query = (
-            f"SELECT * FROM cypher("
+            f"SELECT * FROM ag_catalog.cypher("
             f"'{project_id}', "
             f"$$MATCH (d)-[e:e_{dtu(relation_type_id)} {{id: $relation_id}}]->(r) "
             f"{set_clause}"
             f"{remove_clause} "
             f"RETURN d, e, r$$, :params"
-            f") as (d agtype, e agtype, r agtype);"
+            f") as (d ag_catalog.agtype, e ag_catalog.agtype, r ag_catalog.agtype);"
         )
 
         record = await self.fetchrow(
@@ -730,12 +815,12 @@ class DataRepository(BaseRepository):
         ):
             async with inner_connection.transaction():
                 query = (
-                    f"SELECT * FROM cypher("
+                    f"SELECT * FROM ag_catalog.cypher("
                     f"'{project_id}', "
                     f"$$MATCH (d)-[e:e_{dtu(relation_type_id)} {{id: $relation_id}}]->(r) "
                     f"DELETE e "
                     f"RETURN d, e, r$$, :params"
-                    f") as (d agtype, e agtype, r agtype);"
+                    f") as (d ag_catalog.agtype, e ag_catalog.agtype, r ag_catalog.agtype);"
                 )
 
                 record = await self.fetchrow(
@@ -754,11 +839,11 @@ class DataRepository(BaseRepository):
                 # Delete relation entity to enable source relations
                 await self.execute(
                     (
-                        f"SELECT * FROM cypher("
+                        f"SELECT * FROM ag_catalog.cypher("
                         f"'{project_id}', "
                         f"$$MATCH (en:en_{dtu(relation_type_id)} {{id: $id}}) "
                         f"DELETE en$$, :params"
-                        f") as (en agtype);"
+                        f") as (en ag_catalog.agtype);"
                     ),
                     {
                         "params": json.dumps(
@@ -833,13 +918,13 @@ class DataRepository(BaseRepository):
         self.__class__._check_valid_label(entity_type_id)
 
         query = (
-            f"SELECT * FROM cypher("
+            f"SELECT * FROM ag_catalog.cypher("
             f"'{project_id}', "
             f"$$MATCH (n:n_{dtu(entity_type_id)}) "
             f"WITH n.id as id "
             f"ORDER BY n.id "
             f"RETURN id$$"
-            f") as (id agtype);"
+            f") as (id ag_catalog.agtype);"
         )
 
         records = await self.fetch(
@@ -850,65 +935,171 @@ class DataRepository(BaseRepository):
 
         return [int(r["id"]) for r in records]
 
-    async def find_entities_linked_to_entity(
+    async def count_entities(
         self,
         project_id: str,
-        start_entity_type_id: str,
         entity_type_id: str,
-        entity_id: int,
-        path_parts: typing.List[str],
         connection: asyncpg.Connection = None,
-    ) -> typing.List:
+    ) -> int:
         self.__class__._check_valid_label(project_id)
-        self.__class__._check_valid_label(start_entity_type_id)
         self.__class__._check_valid_label(entity_type_id)
 
-        cypher_path = ""
-        last_index = len(path_parts) - 1
-        for index, part in enumerate(path_parts):
-            [direction, relation_type_id] = part.split("_")
-            self.__class__._check_valid_label(relation_type_id)
-            if direction == "$r":
-                rel_start = "-"
-                rel_end = "->"
-            else:
-                rel_start = "<-"
-                rel_end = "-"
+        # TODO: use cypher query when property indices are available (https://github.com/apache/incubator-age/issues/45)
+        return await self.fetchval(
+            f'SELECT count(*) FROM "{project_id}"._i_n_{dtu(entity_type_id)};',
+            connection=connection,
+        )
 
-            if index == 0:
-                node = f"(n:n_{dtu(start_entity_type_id)})"
-            else:
-                node = "()"
+    async def iter_entity_ids(
+        self,
+        project_id: str,
+        entity_type_id: str,
+        page_size: int = BATCH_SIZE,
+        connection: asyncpg.Connection = None,
+    ) -> typing.AsyncIterator[typing.List[int]]:
+        """Stream all entity ids of an entity type (ordered by id) in pages of at most page_size ids.
 
-            if index == last_index:
-                end_node = f"(\\:n_{dtu(entity_type_id)} {{id: $entity_id}})"
-            else:
-                end_node = ""
+        Keyset pagination on the additional index table is used, so memory usage does not depend on the number of
+        entities and the first page is available immediately.
+        """
+        self.__class__._check_valid_label(project_id)
+        self.__class__._check_valid_label(entity_type_id)
 
-            cypher_path = f"{cypher_path}{node}{rel_start}[\\:e_{dtu(relation_type_id)}]{rel_end}{end_node}"
+        # TODO: use cypher query when property indices are available (https://github.com/apache/incubator-age/issues/45)
+        first_page_query = (
+            f'SELECT id FROM "{project_id}"._i_n_{dtu(entity_type_id)} '
+            f"ORDER BY id "
+            f"LIMIT :limit;"
+        )
+        next_page_query = (
+            f'SELECT id FROM "{project_id}"._i_n_{dtu(entity_type_id)} '
+            f"WHERE id > :last_id "
+            f"ORDER BY id "
+            f"LIMIT :limit;"
+        )
 
-        query = (
-            f"SELECT * FROM cypher("
-            f"'{project_id}', "
-            f"$$MATCH {cypher_path} "
-            f"RETURN n.id$$, :params"
-            f") as (id agtype);"
+        records = await self.fetch(
+            first_page_query,
+            {
+                "limit": page_size,
+            },
+            connection=connection,
+        )
+        while records:
+            page = [r["id"] for r in records]
+            yield page
+            if len(page) < page_size:
+                return
+            records = await self.fetch(
+                next_page_query,
+                {
+                    "last_id": page[-1],
+                    "limit": page_size,
+                },
+                connection=connection,
+            )
+
+    @staticmethod
+    def _cypher_relation(part: str, relation_props: str = "") -> str:
+        """Convert a path part ($r_id or $ri_id) to a Cypher relationship pattern (including the direction)."""
+        [direction, relation_type_id] = part.split("_")
+        BaseRepository._check_valid_label(relation_type_id)
+        relation = f"[\\:e_{dtu(relation_type_id)}{relation_props}]"
+        if direction == "$r":
+            return f"-{relation}->"
+        return f"<-{relation}-"
+
+    async def _find_entities_linked(
+        self,
+        project_id: str,
+        cypher_paths: typing.List[str],
+        params: typing.Dict,
+        connection: asyncpg.Connection = None,
+    ) -> typing.List[typing.Set[int]]:
+        """Find the ids of the start nodes (n) of multiple Cypher paths using a single query.
+
+        Args:
+            project_id (str): Project id.
+            cypher_paths (typing.List[str]): Cypher paths, with the start node named n.
+            params (typing.Dict): Cypher parameters (shared by all paths).
+            connection (asyncpg.Connection, optional): Connection to be used.
+
+        Returns:
+            typing.List[typing.Set[int]]: The ids found for each path, in the order of the paths.
+        """
+        results = [set() for _ in cypher_paths]
+        if not cypher_paths:
+            return results
+
+        # Identical paths are only resolved once
+        unique_paths = list(dict.fromkeys(cypher_paths))
+        query = " UNION ".join(
+            [
+                f"SELECT {index} AS path, id FROM ag_catalog.cypher("
+                f"'{project_id}', "
+                f"$$MATCH {cypher_path} "
+                f"RETURN n.id$$, :params"
+                f") as (id ag_catalog.agtype)"
+                for index, cypher_path in enumerate(unique_paths)
+            ]
         )
 
         records = await self.fetch(
-            query,
+            f"{query};",
             {
-                "params": json.dumps(
-                    {
-                        "entity_id": entity_id,
-                    }
-                )
+                "params": json.dumps(params),
             },
             age=True,
             connection=connection,
         )
 
-        return [int(r["id"]) for r in records]
+        ids_by_unique_path = [set() for _ in unique_paths]
+        for record in records:
+            ids_by_unique_path[record["path"]].add(int(record["id"]))
+        for index, cypher_path in enumerate(cypher_paths):
+            results[index] = ids_by_unique_path[unique_paths.index(cypher_path)]
+
+        return results
+
+    async def find_entities_linked_to_entity(
+        self,
+        project_id: str,
+        start_entity_type_id: str,
+        entity_type_id: str,
+        entity_id: int,
+        paths: typing.List[typing.List[str]],
+        connection: asyncpg.Connection = None,
+    ) -> typing.List[typing.Set[int]]:
+        """Find the entities of a start entity type linked to an entity by each of the given relation paths.
+
+        All paths are resolved using a single query.
+
+        Returns:
+            typing.List[typing.Set[int]]: The start entity ids for each path, in the order of the paths.
+        """
+        self.__class__._check_valid_label(project_id)
+        self.__class__._check_valid_label(start_entity_type_id)
+        self.__class__._check_valid_label(entity_type_id)
+
+        cypher_paths = []
+        for path_parts in paths:
+            relations = "()".join(
+                [self.__class__._cypher_relation(part) for part in path_parts]
+            )
+            cypher_paths.append(
+                f"(n:n_{dtu(start_entity_type_id)})"
+                f"{relations}"
+                f"(\\:n_{dtu(entity_type_id)} {{id: $entity_id}})"
+            )
+
+        return await self._find_entities_linked(
+            project_id,
+            cypher_paths,
+            {
+                "entity_id": entity_id,
+            },
+            connection,
+        )
 
     async def find_entities_linked_to_relation(
         self,
@@ -916,58 +1107,37 @@ class DataRepository(BaseRepository):
         start_entity_type_id: str,
         end_relation_type_id: str,
         relation_id: int,
-        path_parts: typing.List[str],
+        paths: typing.List[typing.List[str]],
         connection: asyncpg.Connection = None,
-    ) -> typing.List:
+    ) -> typing.List[typing.Set[int]]:
+        """Find the entities of a start entity type linked to a relation by each of the given relation paths.
+
+        All paths are resolved using a single query.
+
+        Returns:
+            typing.List[typing.Set[int]]: The start entity ids for each path, in the order of the paths.
+        """
         self.__class__._check_valid_label(project_id)
         self.__class__._check_valid_label(start_entity_type_id)
         self.__class__._check_valid_label(end_relation_type_id)
 
-        cypher_path = ""
-        last_index = len(path_parts) - 1
-        for index, part in enumerate(path_parts):
-            [direction, relation_type_id] = part.split("_")
-            self.__class__._check_valid_label(relation_type_id)
-            if direction == "$r":
-                rel_start = "-"
-                rel_end = "->"
-            else:
-                rel_start = "<-"
-                rel_end = "-"
-
-            if index == 0:
-                node = f"(n:n_{dtu(start_entity_type_id)})"
-            else:
-                node = "()"
-
-            if index == last_index:
-                relation = f"[\\:e_{dtu(relation_type_id)} {{id: $relation_id}}]"
-                end_node = "()"
-            else:
-                relation = f"[\\:e_{dtu(relation_type_id)}]"
-                end_node = ""
-
-            cypher_path = f"{cypher_path}{node}{rel_start}{relation}{rel_end}{end_node}"
-
-        query = (
-            f"SELECT * FROM cypher("
-            f"'{project_id}', "
-            f"$$MATCH {cypher_path} "
-            f"RETURN n.id$$, :params"
-            f") as (id agtype);"
-        )
+        cypher_paths = []
+        for path_parts in paths:
+            relations = [
+                self.__class__._cypher_relation(part) for part in path_parts[:-1]
+            ]
+            relations.append(
+                self.__class__._cypher_relation(path_parts[-1], " {id: $relation_id}")
+            )
+            cypher_paths.append(
+                f"(n:n_{dtu(start_entity_type_id)}){'()'.join(relations)}()"
+            )
 
-        records = await self.fetch(
-            query,
+        return await self._find_entities_linked(
+            project_id,
+            cypher_paths,
             {
-                "params": json.dumps(
-                    {
-                        "relation_id": relation_id,
-                    }
-                )
+                "relation_id": relation_id,
             },
-            age=True,
-            connection=connection,
+            connection,
         )
-
-        return [int(r["id"]) for r in records]
@@ -0,0 +1,154 @@
+import json
+import typing
+
+import asyncpg
+
+from app.db.base import BaseRepository
+
+# Postgres notification channel used to wake up the Elasticsearch outbox workers
+ES_OUTBOX_CHANNEL = "es_outbox"
+
+
+class EsOutboxRepository(BaseRepository):
+    """Repository for the Elasticsearch outbox (app.es_outbox, see migrations/es_outbox.sql)."""
+
+    async def add(
+        self,
+        project_name: str,
+        es_query: typing.Dict,
+        connection: asyncpg.Connection = None,
+    ) -> None:
+        # The notification is only delivered when the transaction is committed
+        await self.execute(
+            """
+                WITH outbox AS (
+                    INSERT INTO app.es_outbox (project_name, es_query)
+                    VALUES (:project_name, :es_query::jsonb)
+                    RETURNING es_outbox.id
+                )
+                SELECT pg_notify(:channel, outbox.id::text)
+                FROM outbox;
+            """,
+            {
+                "project_name": project_name,
+                "es_query": json.dumps(es_query),
+                "channel": ES_OUTBOX_CHANNEL,
+            },
+            connection=connection,
+        )
+
+    async def get_pending_project_names(self) -> typing.List[str]:
+        records = await self.fetch(
+            """
+                SELECT DISTINCT es_outbox.project_name
+                FROM app.es_outbox
+                WHERE es_outbox.dead_lettered IS NULL
+                AND es_outbox.next_attempt <= NOW();
+            """
+        )
+        return [record["project_name"] for record in records]
+
+    async def try_lock_project(
+        self,
+        project_name: str,
+        connection: asyncpg.Connection,
+    ) -> bool:
+        """Try to get the lock for processing the outbox of a project, until the transaction of the connection ends.
+
+        Rows are only claimed by the lock holder, so updates of the same entity can't be applied out of order by
+        multiple workers.
+        """
+        return await self.fetchval(
+            """
+                SELECT pg_try_advisory_xact_lock(hashtext(:channel), hashtext(:project_name));
+            """,
+            {
+                "channel": ES_OUTBOX_CHANNEL,
+                "project_name": project_name,
+            },
+            connection=connection,
+        )
+
+    async def claim(
+        self,
+        project_name: str,
+        limit: int,
+        connection: asyncpg.Connection,
+    ) -> typing.List[typing.Dict]:
+        """Lock the oldest pending rows of a project.
+
+        The rows are locked until the transaction of the connection ends.
+        The project lock (try_lock_project) should be held, SKIP LOCKED only prevents waiting for rows that are being
+        updated or deleted otherwise.
+        """
+        records = await self.fetch(
+            """
+                SELECT es_outbox.id, es_outbox.es_query::text
+                FROM app.es_outbox
+                WHERE es_outbox.project_name = :project_name
+                AND es_outbox.dead_lettered IS NULL
+                AND es_outbox.next_attempt <= NOW()
+                ORDER BY es_outbox.id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED;
+            """,
+            {
+                "project_name": project_name,
+                "limit": limit,
+            },
+            connection=connection,
+        )
+        return [
+            {
+                "id": record["id"],
+                "es_query": json.loads(record["es_query"]),
+            }
+            for record in records
+        ]
+
+    async def delete(
+        self,
+        ids: typing.List[int],
+        connection: asyncpg.Connection,
+    ) -> None:
+        await self.execute(
+            """
+                DELETE FROM app.es_outbox
+                WHERE es_outbox.id = ANY(:ids);
+            """,
+            {
+                "ids": ids,
+            },
+            connection=connection,
+        )
+
+    async def add_failure(
+        self,
+        id: int,
+        error: str,
+        max_attempts: int,
+        retry_delay: float,
+        connection: asyncpg.Connection,
+    ) -> bool:
+        """Register a failed attempt; returns whether the row has been moved to the dead-letter state."""
+        return await self.fetchval(
+            """
+                UPDATE app.es_outbox
+                SET
+                    attempts = es_outbox.attempts + 1,
+                    last_error = :error,
+                    next_attempt = NOW() + INTERVAL '1 SECOND' * :retry_delay::float * 2 ^ es_outbox.attempts,
+                    dead_lettered = CASE
+                        WHEN es_outbox.attempts + 1 >= :max_attempts THEN NOW()
+                    END
+                WHERE es_outbox.id = :id
+                RETURNING es_outbox.dead_lettered IS NOT NULL;
+            """,
+            {
+                "id": id,
+                "error": error,
+                "max_attempts": max_attempts,
+                "retry_delay": retry_delay,
+            },
+            connection=connection,
+        )
@@ -6,6 +6,47 @@ import asyncpg
 
 from app.db.base import BaseRepository
 
+# Columns of the revision tables, in the order of the values in the records to be inserted
+ENTITIES_REVISION_COLUMNS = (
+    "revision_id",
+    "user_id",
+    "entity_type_revision_id",
+    "entity_type_id",
+    "entity_id",
+    "old_value",
+    "new_value",
+)
+RELATIONS_REVISION_COLUMNS = (
+    "revision_id",
+    "user_id",
+    "relation_type_revision_id",
+    "relation_type_id",
+    "relation_id",
+    "start_entity_type_revision_id",
+    "start_entity_type_id",
+    "start_entity_id",
+    "end_entity_type_revision_id",
+    "end_entity_type_id",
+    "end_entity_id",
+    "old_value",
+    "new_value",
+)
+RELATION_SOURCES_REVISION_COLUMNS = (
+    "revision_id",
+    "user_id",
+    "source_relation_type_revision_id",
+    "source_relation_type_id",
+    "source_relation_id",
+    "start_relation_type_revision_id",
+    "start_relation_type_id",
+    "start_relation_id",
+    "end_entity_type_revision_id",
+    "end_entity_type_id",
+    "end_entity_id",
+    "old_value",
+    "new_value",
+)
+
 
 class RevisionRepository(BaseRepository):
     async def get_new_revision_count(
@@ -29,106 +70,41 @@ class RevisionRepository(BaseRepository):
     async def post_entities_revision(
         self,
         project_id: str,
-        data: typing.List[typing.List],
+        data: typing.List[typing.Tuple],
         connection: asyncpg.connection.Connection,
-    ) -> typing.Dict:
-        await self.executemany(
-            (
-                f'INSERT INTO revision."{project_id}_entities" '
-                f"(revision_id, user_id, entity_type_revision_id, entity_type_id, entity_id, old_value, new_value) "
-                f"VALUES "
-                f"(:revision_id, :user_id, :entity_type_revision_id, :entity_type_id, :entity_id, :old_value, :new_value)"
-            ),
+    ) -> None:
+        await self.copy_records_to_table(
+            f"{project_id}_entities",
             data,
+            ENTITIES_REVISION_COLUMNS,
+            schema_name="revision",
             connection=connection,
         )
 
     async def post_relations_revision(
         self,
         project_id: str,
-        data: typing.List[typing.List],
+        data: typing.List[typing.Tuple],
         connection: asyncpg.connection.Connection,
-    ) -> typing.Dict:
-        await self.executemany(
-            (
-                f'INSERT INTO revision."{project_id}_relations" '
-                f"("
-                f"    revision_id,"
-                f"    user_id,"
-                f"    relation_type_revision_id,"
-                f"    relation_type_id,"
-                f"    relation_id,"
-                f"    start_entity_type_revision_id,"
-                f"    start_entity_type_id,"
-                f"    start_entity_id,"
-                f"    end_entity_type_revision_id,"
-                f"    end_entity_type_id,"
-                f"    end_entity_id,"
-                f"    old_value,"
-                f"    new_value"
-                f") "
-                f"VALUES "
-                f"("
-                f"    :revision_id,"
-                f"    :user_id,"
-                f"    :relation_type_revision_id,"
-                f"    :relation_type_id,"
-                f"    :relation_id,"
-                f"    :start_entity_type_revision_id,"
-                f"    :start_entity_type_id,"
-                f"    :start_entity_id,"
-                f"    :end_entity_type_revision_id,"
-                f"    :end_entity_type_id,"
-                f"    :end_entity_id,"
-                f"    :old_value,"
-                f"    :new_value"
-                f")"
-            ),
+    ) -> None:
+        await self.copy_records_to_table(
+            f"{project_id}_relations",
             data,
+            RELATIONS_REVISION_COLUMNS,
+            schema_name="revision",
             connection=connection,
         )
 
     async def post_relation_sources_revision(
         self,
         project_id: str,
-        data: typing.List[typing.List],
+        data: typing.List[typing.Tuple],
         connection: asyncpg.connection.Connection,
-    ) -> typing.Dict:
-        await self.executemany(
-            (
-                f'INSERT INTO revision."{project_id}_relation_sources" '
-                f"("
-                f"    revision_id,"
-                f"    user_id,"
-                f"    source_relation_type_revision_id,"
-                f"    source_relation_type_id,"
-                f"    source_relation_id,"
-                f"    start_relation_type_revision_id,"
-                f"    start_relation_type_id,"
-                f"    start_relation_id,"
-                f"    end_entity_type_revision_id,"
-                f"    end_entity_type_id,"
-                f"    end_entity_id,"
-                f"    old_value,"
-                f"    new_value"
-                f") "
-                f"VALUES "
-                f"("
-                f"    :revision_id,"
-                f"    :user_id,"
-                f"    :source_relation_type_revision_id,"
-                f"    :source_relation_type_id,"
-                f"    :source_relation_id,"
-                f"    :start_relation_type_revision_id,"
-                f"    :start_relation_type_id,"
-                f"    :start_relation_id,"
-                f"    :end_entity_type_revision_id,"
-                f"    :end_entity_type_id,"
-                f"    :end_entity_id,"
-                f"    :old_value,"
-                f"    :new_value"
-                f")"
-            ),
+    ) -> None:
+        await self.copy_records_to_table(
+            f"{project_id}_relation_sources",
             data,
+            RELATION_SOURCES_REVISION_COLUMNS,
+            schema_name="revision",
             connection=connection,
         )
@@ -1,14 +1,18 @@
+import asyncio
+import functools
 import json
 import re
+import string
 import time
 import typing
+import unicodedata
 import uuid
 from datetime import date, datetime
 
 import edtf
 import elasticsearch
 import roman
-from elasticsearch.helpers import async_bulk
+from elasticsearch.helpers import BulkIndexError, async_bulk
 
 from app.config import ELASTICSEARCH
 from app.utils import RE_FIELD_CONVERSION, dtu
@@ -26,6 +30,278 @@ DATE_MAX = "999999999"
 
 RE_YYYY_MM_DD = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$")
 RE_YYYY = re.compile(r"^[0-9]{4}$")
+RE_PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}]")
+RE_NUMBER = re.compile(r"([0-9])")
+
+# Number of seconds bulk operations on the same alias are collected before being sent together
+BULK_COALESCE_WINDOW = 0.05
+
+
+# Concrete index behind each alias, as set by this process
+_alias_indices: typing.Dict[str, str] = {}
+# Number of bulk operations on each alias by this process
+_alias_writes: typing.Dict[str, int] = {}
+
+
+def get_alias_generation(alias_name: str) -> str:
+    """Get a key that changes whenever this process changes the documents behind an alias.
+
+    Changes by other processes are not detected: results cached by generation should also expire.
+    """
+    return f"{_alias_indices.get(alias_name)}|{_alias_writes.get(alias_name, 0)}"
+
+
+class BulkCoalescer:
+    """Collects bulk actions for a single refresh policy and sends them in a single bulk request."""
+
+    def __init__(
+        self, es: elasticsearch.AsyncElasticsearch, refresh: typing.Union[bool, str]
+    ) -> None:
+        self._es = es
+        self._refresh = refresh
+        self._pending: typing.List[typing.Tuple[typing.List, asyncio.Future]] = []
+        self._flush_task: typing.Optional[asyncio.Task] = None
+        # Bulk requests are sent one at a time, so operations on the same document are applied in order
+        self._lock = asyncio.Lock()
+
+    async def add(self, actions: typing.List[typing.Dict]) -> None:
+        """Add actions to the next bulk request and wait until it has been processed."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((actions, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        await future
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(BULK_COALESCE_WINDOW)
+        async with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._flush_task = None
+
+            try:
+                (_, errors) = await async_bulk(
+                    self._es,
+                    [action for (actions, _) in pending for action in actions],
+                    refresh=self._refresh,
+                    raise_on_error=False,
+                )
+            except Exception as e:
+                for (_, future) in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        # Only raise errors for the operations that failed
+        errors_by_id = {}
+        for error in errors:
+            error_id = str(next(iter(error.values())).get("_id"))
+            errors_by_id.setdefault(error_id, []).append(error)
+        for (actions, future) in pending:
+            if future.done():
+                continue
+            action_errors = [
+                error
+                for action in actions
+                for error in errors_by_id.get(str(action["_id"]), [])
+            ]
+            if action_errors:
+                future.set_exception(
+                    BulkIndexError(
+                        f"{len(action_errors)} document(s) failed to index.",
+                        action_errors,
+                    )
+                )
+            else:
+                future.set_result(None)
+
+
+# Bulk coalescers, by Elasticsearch client, alias and refresh policy
+_bulk_coalescers: typing.Dict[typing.Tuple, BulkCoalescer] = {}
+
+
+class SelectorTemplate:
+    """
+    Compiled selector value (e.g. "$r_<uuid>->$<uuid>").
+    All static work done by BaseElasticsearch.replace (splitting concatenations, finding matches and their common
+    base, parsing paths and property keys) is performed once when compiling, so that rendering for an entity only
+    needs to walk the data.
+    """
+
+    __slots__ = ("input", "parts", "base", "template", "matches")
+
+    def __init__(self, input: str) -> None:
+        self.input = input
+        # Concatenation of multiple selector values
+        self.parts = None
+        # Common base of all matches and the selector value relative to this base
+        self.base = None
+        self.template = None
+        # [match, path to travel, last path element, kind, relation type id, property key]
+        self.matches = []
+
+        # Split concatenate cases
+        if " $||$ " in input:
+            self.parts = [SelectorTemplate(part) for part in input.split(" $||$ ")]
+            return
+
+        matches = RE_FIELD_CONVERSION.findall(input)
+
+        # Find common base in matches, preventing multiplying current_level numbers
+        if len(matches) > 1:
+            (base, based_matches) = BaseElasticsearch.find_common_base_path(matches)
+            if base != "":
+                for i, match in enumerate(matches):
+                    input = input.replace(match, based_matches[i], 1)
+                self.base = BaseElasticsearch._split_path(base)
+                self.template = SelectorTemplate(input)
+                return
+
+        for match in matches:
+            if not match:
+                continue
+
+            path = [p.replace("$", "") for p in match.split("->")]
+            last = path[-1]
+            rel_type_id = None
+            if "." in last:
+                # relation property
+                (rel_type_id, r_prop) = last.split(".")
+                kind = "r_prop"
+                key = "id" if r_prop == "id" else f"p_{dtu(r_prop)}"
+            elif last == "display_name" or last == "entity_type_name":
+                kind = last
+                key = None
+            else:
+                # entity property
+                kind = "e_prop"
+                key = "id" if last == "id" else f"p_{dtu(last)}"
+            self.matches.append([match, path[:-1], last, kind, rel_type_id, key])
+
+    def render(
+        self,
+        entity_types_config: typing.Dict,
+        entity_type_names: typing.Dict,
+        data: typing.Dict,
+        display_not_available: bool = False,
+    ) -> typing.List[str]:
+        if self.parts is not None:
+            return [
+                result
+                for part in self.parts
+                for result in part.render(
+                    entity_types_config,
+                    entity_type_names,
+                    data,
+                    display_not_available,
+                )
+            ]
+
+        if self.base is not None:
+            return [
+                result
+                for data in BaseElasticsearch._get_datas_for_path(self.base, data)
+                for result in self.template.render(
+                    entity_types_config,
+                    entity_type_names,
+                    data,
+                    display_not_available,
+                )
+            ]
+
+        results = [self.input]
+
+        for [match, path, last, kind, rel_type_id, key] in self.matches:
+            if not results:
+                break
+
+            # travel
+            current_levels = [data]
+            for p in path:
+                current_levels = [
+                    new_current_level
+                    for current_level in current_levels
+                    if "relations" in current_level and p in current_level["relations"]
+                    for new_current_level in current_level["relations"][p].values()
+                ]
+                if not current_levels:
+                    results = []
+                    break
+            if not results:
+                break
+
+            if kind == "r_prop":
+                new_results = []
+                for result in results:
+                    for current_level in current_levels:
+                        if rel_type_id == "":
+                            if key not in current_level["r_props"]:
+                                continue
+                            new_results.append(
+                                result.replace(
+                                    match, str(current_level["r_props"][key])
+                                )
+                            )
+                        else:
+                            if "relations" not in current_level:
+                                continue
+                            if rel_type_id not in current_level["relations"]:
+                                continue
+                            for relation in current_level["relations"][
+                                rel_type_id
+                            ].values():
+                                if key not in relation["r_props"]:
+                                    continue
+                                new_results.append(
+                                    result.replace(match, str(relation["r_props"][key]))
+                                )
+                results = new_results
+                continue
+            if kind == "display_name":
+                results = [
+                    result.replace(
+                        match,
+                        entity_types_config[
+                            entity_type_names[current_level["entity_type_id"]]
+                        ]["display_name"],
+                    )
+                    for result in results
+                    for current_level in current_levels
+                ]
+                continue
+            if kind == "entity_type_name":
+                results = [
+                    result.replace(
+                        match,
+                        entity_type_names[current_level["entity_type_id"]],
+                    )
+                    for result in results
+                    for current_level in current_levels
+                ]
+                continue
+            new_results = [
+                result.replace(match, str(current_level["e_props"][key]))
+                for result in results
+                for current_level in current_levels
+                if key in current_level["e_props"]
+            ]
+            if new_results:
+                results = new_results
+                continue
+            if display_not_available:
+                results = [result.replace(match, "N/A") for result in results]
+                continue
+            # no value found => try to travel further using the last path element
+            if not any(
+                "relations" in current_level and last in current_level["relations"]
+                for current_level in current_levels
+            ):
+                results = []
+
+        # Replace single quotes with double quotes so lists can be loaded as json
+        results = [result.replace("'", '"') for result in results]
+
+        return results
 
 
 class BaseElasticsearch:
@@ -126,6 +402,15 @@ class BaseElasticsearch:
             ],
         ]
 
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def compile_selector(input: str) -> SelectorTemplate:
+        """
+        Compile a selector value once, so it can be evaluated for many entities (see SelectorTemplate).
+        Selector values only depend on the configuration, so the number of distinct values is limited.
+        """
+        return SelectorTemplate(input)
+
     @staticmethod
     def replace(
         entity_types_config: typing.Dict,
@@ -137,141 +422,12 @@ class BaseElasticsearch:
         """
         Always returns an array of strings because of the usage of str.replace().
         """
-        # Split concatenate cases
-        if " $||$ " in input:
-            return [
-                result
-                for input_part in input.split(" $||$ ")
-                for result in BaseElasticsearch.replace(
-                    entity_types_config,
-                    entity_type_names,
-                    input_part,
-                    data,
-                    display_not_available,
-                )
-            ]
-
-        results = [input]
-
-        matches = RE_FIELD_CONVERSION.findall(input)
-
-        # Find common base in matches, preventing multiplying current_level numbers
-        if len(matches) > 1:
-            (base, based_matches) = BaseElasticsearch.find_common_base_path(matches)
-            if base != "":
-                for i, match in enumerate(matches):
-                    input = input.replace(match, based_matches[i], 1)
-                return [
-                    result
-                    for data in BaseElasticsearch.get_datas_for_base(base, data)
-                    for result in BaseElasticsearch.replace(
-                        entity_types_config,
-                        entity_type_names,
-                        input,
-                        data,
-                        display_not_available,
-                    )
-                ]
-
-        for match in matches:
-            if not results:
-                break
-
-            if not match:
-                continue
-
-            current_levels = [data]
-            path = [p.replace("$", "") for p in match.split("->")]
-
-            for i, p in enumerate(path):
-                if i == len(path) - 1:
-                    # relation property
-                    if "." in p:
-                        (rel_type_id, r_prop) = p.split(".")
-                        key = "id" if r_prop == "id" else f"p_{dtu(r_prop)}"
-                        new_results = []
-                        for result in results:
-                            for current_level in current_levels:
-                                if rel_type_id == "":
-                                    if key not in current_level["r_props"]:
-                                        continue
-                                    new_results.append(
-                                        result.replace(
-                                            match, str(current_level["r_props"][key])
-                                        )
-                                    )
-                                else:
-                                    if "relations" not in current_level:
-                                        continue
-                                    if rel_type_id not in current_level["relations"]:
-                                        continue
-                                    for relation in current_level["relations"][
-                                        rel_type_id
-                                    ].values():
-                                        if key not in relation["r_props"]:
-                                            continue
-                                        new_results.append(
-                                            result.replace(
-                                                match, str(relation["r_props"][key])
-                                            )
-                                        )
-                        results = new_results
-                        break
-                    # entity property
-                    if p == "display_name":
-                        results = [
-                            result.replace(
-                                match,
-                                entity_types_config[
-                                    entity_type_names[current_level["entity_type_id"]]
-                                ]["display_name"],
-                            )
-                            for result in results
-                            for current_level in current_levels
-                        ]
-                        break
-                    if p == "entity_type_name":
-                        results = [
-                            result.replace(
-                                match,
-                                entity_type_names[current_level["entity_type_id"]],
-                            )
-                            for result in results
-                            for current_level in current_levels
-                        ]
-                        break
-                    key = "id" if p == "id" else f"p_{dtu(p)}"
-                    new_results = [
-                        result.replace(match, str(current_level["e_props"][key]))
-                        for result in results
-                        for current_level in current_levels
-                        if key in current_level["e_props"]
-                    ]
-                    if new_results:
-                        results = new_results
-                        break
-                    if not new_results and display_not_available:
-                        results = [result.replace(match, "N/A") for result in results]
-                        break
-                # not last element => p = relation => travel
-                new_current_levels = []
-                for current_level in current_levels:
-                    if (
-                        "relations" not in current_level
-                        or p not in current_level["relations"]
-                    ):
-                        continue
-                    for new_current_level in current_level["relations"][p].values():
-                        new_current_levels.append(new_current_level)
-                current_levels = new_current_levels
-                if not current_levels:
-                    results = []
-                    break
-
-        # Replace single quotes with double quotes so lists can be loaded as json
-        results = [result.replace("'", '"') for result in results]
-
-        return results
+        return BaseElasticsearch.compile_selector(input).render(
+            entity_types_config,
+            entity_type_names,
+            data,
+            display_not_available,
+        )
 
     @staticmethod
     def get_datas_for_base(base: str, data: typing.Dict) -> typing.List[typing.Dict]:
@@ -281,8 +437,20 @@ class BaseElasticsearch:
         """
         if base == "":
             return [data]
+        return BaseElasticsearch._get_datas_for_path(
+            BaseElasticsearch._split_path(base), data
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _split_path(base: str) -> typing.Tuple[str]:
+        return tuple(p.replace("$", "") for p in base.split("->"))
+
+    @staticmethod
+    def _get_datas_for_path(
+        path: typing.Iterable[str], data: typing.Dict
+    ) -> typing.List[typing.Dict]:
         current_levels = [data]
-        path = [p.replace("$", "") for p in base.split("->")]
         for p in path:
             new_current_levels = []
             for current_level in current_levels:
@@ -295,6 +463,48 @@ class BaseElasticsearch:
             current_levels = new_current_levels
         return current_levels
 
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def _parse_edtf(
+        str_value: str,
+    ) -> typing.Tuple[time.struct_time, time.struct_time]:
+        """
+        Parse an EDTF string and return its strict lower and upper bounds.
+        Parsing is expensive and the same values (years, dates) occur very often, so results are cached.
+        """
+        try:
+            # edtf module needs to be updated to the newest revision
+            # https://github.com/ixc/python-edtf/issues/24
+            old_edtf_text = str_value.replace("X", "u")
+            edtf_date = edtf.parse_edtf(old_edtf_text)
+        except edtf.parser.edtf_exceptions.EDTFParseException:
+            raise Exception(f"EDTF parser cannot parse {old_edtf_text}")
+        return (edtf_date.lower_strict(), edtf_date.upper_strict())
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def normalize(value: str) -> typing.Optional[str]:
+        """
+        Apply the icu_normalizer (see create_new_index) without a round trip to Elasticsearch.
+        ICU folding is approximated by a compatibility decomposition without diacritics, which only matches for
+        characters that are folded to ASCII. None is returned if the result contains other characters.
+        """
+        # remove_special (Java's \p{Punct} only matches ASCII punctuation) and numbers_last char filters
+        value = RE_NUMBER.sub(r"zzz\1", RE_PUNCTUATION.sub("", value))
+        if not value.isascii():
+            # icu_folding
+            value = "".join(
+                [
+                    c
+                    for c in unicodedata.normalize("NFKD", value)
+                    if not unicodedata.combining(c)
+                ]
+            )
+            if not value.isascii():
+                return None
+        # icu_folding (case folding) and lowercase
+        return value.lower()
+
     @staticmethod
     def convert_field(
         entity_types_config: typing.Dict,
@@ -442,22 +652,16 @@ class BaseElasticsearch:
                     }
                 return result
 
-            try:
-                # edtf module needs to be updated to the newest revision
-                # https://github.com/ixc/python-edtf/issues/24
-                old_edtf_text = str_value.replace("X", "u")
-                edtf_date = edtf.parse_edtf(old_edtf_text)
-            except edtf.parser.edtf_exceptions.EDTFParseException:
-                raise Exception(f"EDTF parser cannot parse {old_edtf_text}")
+            (lower_strict, upper_strict) = BaseElasticsearch._parse_edtf(str_value)
             result = {
                 "text": str_value,
-                "lower": time.strftime("%Y-%m-%d", edtf_date.lower_strict()),
-                "upper": time.strftime("%Y-%m-%d", edtf_date.upper_strict()),
+                "lower": time.strftime("%Y-%m-%d", lower_strict),
+                "upper": time.strftime("%Y-%m-%d", upper_strict),
             }
             # only for edtf, not for edtf_interval
             if "interval_position" not in es_field_conf:
-                year_lower = edtf_date.lower_strict()[0]
-                year_upper = edtf_date.upper_strict()[0]
+                year_lower = lower_strict[0]
+                year_upper = upper_strict[0]
                 result["year_range"] = {
                     "gte": year_lower,
                     "lte": year_upper,
@@ -581,43 +785,34 @@ class BaseElasticsearch:
                     )[0]
                     == comp_value
                 ]
+            # Field configurations of the parts are identical for all related datas
+            parts_conf = {
+                "entity_type_name": {
+                    "selector_value": es_field_conf["parts"]["entity_type_name"],
+                    "type": "text",
+                },
+                "id": {
+                    "selector_value": es_field_conf["parts"]["id"],
+                    "type": "integer",
+                },
+                "value": {
+                    "selector_value": es_field_conf["parts"]["selector_value"],
+                    "type": "text_flatten"
+                    if es_field_conf["type"] == "nested_flatten"
+                    else "text",
+                    "display_not_available": es_field_conf.get("display_not_available"),
+                },
+            }
             results = []
             for data in datas:
                 result = {
-                    "entity_type_name": BaseElasticsearch.convert_field(
+                    part: BaseElasticsearch.convert_field(
                         entity_types_config,
                         entity_type_names,
-                        {
-                            "selector_value": es_field_conf["parts"][
-                                "entity_type_name"
-                            ],
-                            "type": "text",
-                        },
+                        part_conf,
                         data,
-                    ),
-                    "id": BaseElasticsearch.convert_field(
-                        entity_types_config,
-                        entity_type_names,
-                        {
-                            "selector_value": es_field_conf["parts"]["id"],
-                            "type": "integer",
-                        },
-                        data,
-                    ),
-                    "value": BaseElasticsearch.convert_field(
-                        entity_types_config,
-                        entity_type_names,
-                        {
-                            "selector_value": es_field_conf["parts"]["selector_value"],
-                            "type": "text_flatten"
-                            if es_field_conf["type"] == "nested_flatten"
-                            else "text",
-                            "display_not_available": es_field_conf.get(
-                                "display_not_available"
-                            ),
-                        },
-                        data,
-                    ),
+                    )
+                    for part, part_conf in parts_conf.items()
                 }
                 if (
                     es_field_conf["type"] == "nested"
@@ -915,6 +1110,7 @@ class BaseElasticsearch:
         )
 
         if "acknowledged" in response and response["acknowledged"] is True:
+            _alias_indices[alias_name] = new_index_name
             return
 
         raise Exception(response["error"]["root_cause"])
@@ -931,8 +1127,19 @@ class BaseElasticsearch:
         await async_bulk(self._es, actions)
 
     async def op_bulk(
-        self, entity_type_id: str, data: typing.Dict, operation: str = None
+        self,
+        entity_type_id: str,
+        data: typing.Dict,
+        operation: str = None,
+        refresh: typing.Union[bool, str] = True,
     ) -> None:
+        """
+        Index, update or delete documents.
+        The refresh policy can be True (refresh immediately), "wait_for" (wait until the changes are visible through
+        the periodic refresh) or False (don't wait).
+        Operations on the same alias with the same refresh policy within BULK_COALESCE_WINDOW seconds are sent in a
+        single bulk request.
+        """
         alias_name = f'{ELASTICSEARCH["prefix"]}_{dtu(entity_type_id)}'
         common = {
             "_index": alias_name,
@@ -951,4 +1158,11 @@ class BaseElasticsearch:
             if operation == "update":
                 action["doc"] = v
             actions.append(action)
-        await async_bulk(self._es, actions, refresh=True)
+        if not actions:
+            return
+
+        key = (self._es, alias_name, refresh)
+        if key not in _bulk_coalescers:
+            _bulk_coalescers[key] = BulkCoalescer(self._es, refresh)
+        await _bulk_coalescers[key].add(actions)
+        _alias_writes[alias_name] = _alias_writes.get(alias_name, 0) + 1
@@ -0,0 +1,265 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import typing
+
+from app.es.base import BaseElasticsearch
+
+FETCH_CONCURRENCY = 2
+CONVERT_CONCURRENCY = 1
+SEND_CONCURRENCY = 2
+# Number of worker processes used to convert entities to documents (0: convert in a thread of the current process)
+CONVERT_PROCESSES = 2
+# Number of batches that can wait between two consecutive stages
+QUEUE_SIZE = 2
+# Number of idle conversion process pools kept for reuse by later reindex jobs
+IDLE_CONVERT_EXECUTORS = 1
+
+_STOP = object()
+
+
+class BulkPipeline:
+    """Bounded fetch -> convert -> send pipeline for indexing batches of entities.
+
+    Each stage is served by a configurable number of workers.
+    Stages are connected by bounded queues, so a slow stage applies backpressure on the stages before it.
+    Conversion is CPU-bound and runs in an executor (the default thread pool if none is provided).
+    """
+
+    def __init__(
+        self,
+        fetch: typing.Callable[[typing.List[int]], typing.Awaitable[typing.Any]],
+        convert: typing.Callable[[typing.Any], typing.Dict],
+        send: typing.Callable[[typing.Dict], typing.Awaitable[None]],
+        fetch_concurrency: int = FETCH_CONCURRENCY,
+        convert_concurrency: int = CONVERT_CONCURRENCY,
+        send_concurrency: int = SEND_CONCURRENCY,
+        queue_size: int = QUEUE_SIZE,
+        executor: concurrent.futures.Executor = None,
+    ) -> None:
+        self._fetch = fetch
+        self._convert = convert
+        self._send = send
+        self._fetch_concurrency = fetch_concurrency
+        self._convert_concurrency = convert_concurrency
+        self._send_concurrency = send_concurrency
+        self._queue_size = queue_size
+        self._executor = executor
+
+    @staticmethod
+    async def _stage(
+        in_queue: asyncio.Queue,
+        out_queue: typing.Optional[asyncio.Queue],
+        process: typing.Callable[[typing.Any], typing.Awaitable[typing.Any]],
+    ) -> None:
+        while True:
+            item = await in_queue.get()
+            if item is _STOP:
+                # Let the other workers of this stage know they can stop as well
+                await in_queue.put(_STOP)
+                return
+            result = await process(item)
+            if out_queue is not None:
+                await out_queue.put(result)
+
+    async def _run_stage(
+        self,
+        concurrency: int,
+        in_queue: asyncio.Queue,
+        out_queue: typing.Optional[asyncio.Queue],
+        process: typing.Callable[[typing.Any], typing.Awaitable[typing.Any]],
+    ) -> None:
+        await asyncio.gather(
+            *[
+                self.__class__._stage(in_queue, out_queue, process)
+                for _ in range(max(concurrency, 1))
+            ]
+        )
+        if out_queue is not None:
+            await out_queue.put(_STOP)
+
+    async def run(
+        self,
+        batches: typing.Union[
+            typing.Iterable[typing.List[int]], typing.AsyncIterable[typing.List[int]]
+        ],
+        progress: typing.Callable[[int], typing.Awaitable[None]] = None,
+    ) -> int:
+        """Push all batches through the pipeline.
+
+        Args:
+            batches: (Async) iterable of batches of entity ids.
+            progress: Optional coroutine function, called with the number of entity ids in each batch that has been
+                sent.
+
+        Returns:
+            int: The number of entity ids that have been processed.
+        """
+        loop = asyncio.get_running_loop()
+        fetch_queue = asyncio.Queue(self._queue_size)
+        convert_queue = asyncio.Queue(self._queue_size)
+        send_queue = asyncio.Queue(self._queue_size)
+        total = 0
+
+        async def produce() -> None:
+            if hasattr(batches, "__aiter__"):
+                async for batch in batches:
+                    if batch:
+                        await fetch_queue.put(batch)
+            else:
+                for batch in batches:
+                    if batch:
+                        await fetch_queue.put(batch)
+            await fetch_queue.put(_STOP)
+
+        async def fetch(batch: typing.List[int]) -> typing.Tuple[int, typing.Any]:
+            return (len(batch), await self._fetch(batch))
+
+        async def convert(
+            item: typing.Tuple[int, typing.Any]
+        ) -> typing.Tuple[int, typing.Dict]:
+            return (
+                item[0],
+                await loop.run_in_executor(self._executor, self._convert, item[1]),
+            )
+
+        async def send(item: typing.Tuple[int, typing.Dict]) -> None:
+            nonlocal total
+            await self._send(item[1])
+            total += item[0]
+            if progress is not None:
+                await progress(item[0])
+
+        tasks = [
+            asyncio.ensure_future(produce()),
+            asyncio.ensure_future(
+                self._run_stage(
+                    self._fetch_concurrency, fetch_queue, convert_queue, fetch
+                )
+            ),
+            asyncio.ensure_future(
+                self._run_stage(
+                    self._convert_concurrency, convert_queue, send_queue, convert
+                )
+            ),
+            asyncio.ensure_future(
+                self._run_stage(self._send_concurrency, send_queue, None, send)
+            ),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Make sure no worker is left behind if one of the stages failed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return total
+
+
+def batched(
+    ids: typing.Union[typing.Iterable[int], typing.AsyncIterable[int]],
+    size: int,
+) -> typing.AsyncIterator[typing.List[int]]:
+    """Group (async) iterable ids into batches of a given size."""
+
+    async def generate() -> typing.AsyncIterator[typing.List[int]]:
+        batch = []
+        if hasattr(ids, "__aiter__"):
+            async for id in ids:
+                batch.append(id)
+                if len(batch) == size:
+                    yield batch
+                    batch = []
+        else:
+            for id in ids:
+                batch.append(id)
+                if len(batch) == size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    return generate()
+
+
+# Entity types config of a conversion worker process, set once when the process is started
+_worker_entity_types_config = None
+
+
+def _init_convert_worker(entity_types_config: typing.Dict) -> None:
+    global _worker_entity_types_config
+    _worker_entity_types_config = entity_types_config
+
+
+def convert_in_worker(
+    es_data_config: typing.List, entities: typing.Dict
+) -> typing.Dict:
+    """Convert entities to documents in a worker process created by create_convert_executor."""
+    return BaseElasticsearch.convert_entities_to_docs(
+        _worker_entity_types_config, es_data_config, entities
+    )
+
+
+def create_convert_executor(
+    entity_types_config: typing.Dict, processes: int
+) -> concurrent.futures.ProcessPoolExecutor:
+    """Create a process pool for convert_in_worker; the entity types config is only shipped once per process."""
+    # Spawn fresh interpreters, forking a process running an event loop (and threads) is not safe
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_convert_worker,
+        initargs=(entity_types_config,),
+    )
+
+
+# Conversion process pools by (entity types config hash, number of processes): [executor, number of users]
+_convert_executors: typing.OrderedDict[
+    typing.Tuple[str, int], typing.List
+] = collections.OrderedDict()
+
+
+async def _shutdown_executor(executor: concurrent.futures.Executor) -> None:
+    # Waiting for the worker processes to exit would block the event loop
+    await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+
+@contextlib.asynccontextmanager
+async def convert_executor(
+    entity_types_config: typing.Dict, processes: int
+) -> typing.AsyncIterator[concurrent.futures.ProcessPoolExecutor]:
+    """Use a process pool for convert_in_worker, reusing the pool of a previous job with the same config if possible.
+
+    At most IDLE_CONVERT_EXECUTORS unused pools are kept, the least recently used ones are shut down.
+    """
+    config_hash = hashlib.sha1(
+        json.dumps(entity_types_config, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    key = (config_hash, processes)
+    if key not in _convert_executors:
+        _convert_executors[key] = [
+            create_convert_executor(entity_types_config, processes),
+            0,
+        ]
+    _convert_executors.move_to_end(key)
+    entry = _convert_executors[key]
+    entry[1] += 1
+    try:
+        yield entry[0]
+    except concurrent.futures.process.BrokenProcessPool:
+        # Don't reuse a pool of which a worker process died
+        if _convert_executors.get(key) is entry:
+            del _convert_executors[key]
+        raise
+    finally:
+        entry[1] -= 1
+        idle_keys = [k for k, (_, users) in _convert_executors.items() if users == 0]
+        for idle_key in idle_keys[: max(len(idle_keys) - IDLE_CONVERT_EXECUTORS, 0)]:
+            await _shutdown_executor(_convert_executors.pop(idle_key)[0])
+        if entry[1] == 0 and _convert_executors.get(key) is not entry:
+            await _shutdown_executor(entry[0])
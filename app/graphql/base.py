@@ -1,5 +1,25 @@
+import inspect
 import typing
 
+import ariadne.asgi
+import graphql
+import starlette.requests
+import starlette.responses
+from ariadne.exceptions import HttpError
+from ariadne.extensions import ExtensionManager
+from ariadne.graphql import (
+    handle_graphql_errors,
+    handle_query_result,
+    parse_query,
+    validate_data,
+    validate_query,
+)
+
+from app.cache.core import LRUCache
+
+# Number of parsed and validated query documents kept in memory per schema
+DOCUMENT_CACHE_SIZE = 512
+
 
 def construct_def(type: str, type_name: str, props: typing.List) -> str:
     def_array = [f"{type} {type_name} {{"]
@@ -10,3 +30,118 @@ def construct_def(type: str, type_name: str, props: typing.List) -> str:
     def_array.append("}")
 
     return "\n".join(def_array)
+
+
+def get_context_value(request: starlette.requests.Request) -> typing.Dict:
+    # Schemas are shared between users: resolvers get the user from the context
+    return {"request": request, "user": request.state.user}
+
+
+class GraphQLHandler(ariadne.asgi.GraphQL):
+    """GraphQL app for a single schema, keeping parsed and validated query documents.
+
+    Instances are meant to be reused for all requests on the same schema.
+    Query execution follows graphql, but parsing and validation are skipped for known queries.
+    """
+
+    def __init__(
+        self,
+        schema: graphql.GraphQLSchema,
+        document_cache_size: int = DOCUMENT_CACHE_SIZE,
+        **kwargs,
+    ) -> None:
+        super().__init__(schema, **kwargs)
+        self._documents = LRUCache(document_cache_size)
+
+    def _get_document(
+        self, query: str, context_value: typing.Any, data: typing.Dict
+    ) -> typing.Tuple[graphql.DocumentNode, typing.List[graphql.GraphQLError]]:
+        # Validation rules depending on the request can't be cached
+        cacheable = not callable(self.validation_rules)
+        if cacheable:
+            document = self._documents.get(query)
+            if document is not None:
+                return (document, [])
+
+        document = parse_query(query)
+
+        validation_rules = self.validation_rules
+        if callable(validation_rules):
+            validation_rules = validation_rules(context_value, document, data)
+
+        validation_errors = validate_query(
+            self.schema,
+            document,
+            validation_rules,
+            enable_introspection=self.introspection,
+        )
+        if cacheable and not validation_errors:
+            self._documents.set(query, document)
+
+        return (document, validation_errors)
+
+    async def _execute(
+        self,
+        data: typing.Any,
+        context_value: typing.Any,
+        extensions: typing.Any,
+        middleware: typing.Any,
+    ) -> typing.Tuple[bool, typing.Dict]:
+        extension_manager = ExtensionManager(extensions, context_value)
+        error_kwargs = {
+            "logger": self.logger,
+            "error_formatter": self.error_formatter,
+            "debug": self.debug,
+            "extension_manager": extension_manager,
+        }
+
+        with extension_manager.request():
+            try:
+                validate_data(data)
+                (document, validation_errors) = self._get_document(
+                    data["query"], context_value, data
+                )
+                if validation_errors:
+                    return handle_graphql_errors(validation_errors, **error_kwargs)
+
+                root_value = self.root_value
+                if callable(root_value):
+                    root_value = root_value(context_value, document)
+                    if inspect.isawaitable(root_value):
+                        root_value = await root_value
+
+                result = graphql.execute(
+                    self.schema,
+                    document,
+                    root_value=root_value,
+                    context_value=context_value,
+                    variable_values=data.get("variables"),
+                    operation_name=data.get("operationName"),
+                    middleware=extension_manager.as_middleware_manager(middleware),
+                )
+                if inspect.isawaitable(result):
+                    result = await result
+            except graphql.GraphQLError as error:
+                return handle_graphql_errors([error], **error_kwargs)
+
+            return handle_query_result(result, **error_kwargs)
+
+    # see ariadne.asgi.GraphQL.graphql_http_server
+    async def graphql_http_server(
+        self, request: starlette.requests.Request
+    ) -> starlette.responses.Response:
+        try:
+            data = await self.extract_data_from_request(request)
+        except HttpError as error:
+            return starlette.responses.PlainTextResponse(
+                error.message or error.status, status_code=400
+            )
+
+        context_value = await self.get_context_for_request(request)
+        extensions = await self.get_extensions_for_request(request, context_value)
+        middleware = await self.get_middleware_for_request(request, context_value)
+
+        (success, result) = await self._execute(
+            data, context_value, extensions, middleware
+        )
+        return await self.create_json_response(request, result, success)
@@ -1,16 +1,21 @@
 import copy
 import typing
 
-import aiocache
 import ariadne
 import starlette
 
-from app.cache.core import create_schema_key_builder
-from app.graphql.base import construct_def
+from app.cache.core import LRUCache, create_schema_key_builder
+from app.graphql.base import GraphQLHandler, construct_def
 from app.mgmt.config import ConfigManager
 from app.models.auth import UserWithPermissions
 from app.utils import RE_FIELD_CONVERSION
 
+# Number of GraphQL handlers (one per compiled schema) kept in memory,
+# by project and config version
+SCHEMA_CACHE_SIZE = 32
+
+_handlers = LRUCache(SCHEMA_CACHE_SIZE)
+
 
 class GraphQLConfigBuilder:
     def __init__(
@@ -509,9 +514,21 @@ class GraphQLConfigBuilder:
             self._get_relation_configs_resolver_wrapper(),
         )
 
-    # TODO: reset cache when project is updated or user permissions have been updated
-    @aiocache.cached(key_builder=create_schema_key_builder)
+    async def get_graphql_handler(self) -> GraphQLHandler:
+        config_version = await self._config_manager.get_config_version(
+            self._project_name
+        )
+        key = create_schema_key_builder(self._create_schema, self, config_version)
+        handler = _handlers.get(key)
+        if handler is None:
+            handler = GraphQLHandler(await self._create_schema())
+            _handlers.set(key, handler)
+        return handler
+
     async def create_schema(self):
+        return (await self.get_graphql_handler()).schema
+
+    async def _create_schema(self):
         self._type_defs_dict = {"Query": []}
         self._query_dict = {"Query": ariadne.QueryType()}
 
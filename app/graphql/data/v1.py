@@ -1,19 +1,24 @@
 import typing
 
-import aiocache
 import aiodataloader
 import ariadne
 import graphql
 import starlette
 
-from app.cache.core import create_schema_key_builder
-from app.graphql.base import construct_def
+from app.cache.core import LRUCache, create_schema_key_builder
+from app.graphql.base import GraphQLHandler, construct_def, get_context_value
 from app.mgmt.auth import allowed_entities_or_relations_and_properties
 from app.mgmt.config import ConfigManager
 from app.mgmt.data import DataManager
 from app.models.auth import UserWithPermissions
 from app.utils import first_cap
 
+# Number of GraphQL handlers (one per compiled schema) kept in memory,
+# by project, config version and effective permissions
+SCHEMA_CACHE_SIZE = 128
+
+_handlers = LRUCache(SCHEMA_CACHE_SIZE)
+
 
 class GraphQLDataBuilder:
     def __init__(
@@ -21,9 +26,17 @@ class GraphQLDataBuilder:
     ) -> None:
         self._project_name = request.path_params["project_name"]
         self._user = user
-        self._data_manager = DataManager(request, self._user)
         self._config_manager = ConfigManager(request, self._user)
 
+    @staticmethod
+    def _get_data_manager(info: graphql.GraphQLResolveInfo) -> DataManager:
+        # Schemas are shared between users: use the request and user from the context
+        if "data_manager" not in info.context:
+            info.context["data_manager"] = DataManager(
+                info.context["request"], info.context["user"]
+            )
+        return info.context["data_manager"]
+
     @staticmethod
     def _get_requested_entity_props(info: graphql.GraphQLResolveInfo):
         return sorted(
@@ -49,9 +62,9 @@ class GraphQLDataBuilder:
         self,
         entity_type_name: str,
     ):
-        def get_entities_wrapper(props: typing.List[str]):
+        def get_entities_wrapper(data_manager: DataManager, props: typing.List[str]):
             async def get_entities(entity_ids: typing.List[int]):
-                data = await self._data_manager.get_entities(
+                data = await data_manager.get_entities(
                     entity_type_name, props, entity_ids
                 )
                 # dataloader expects sequence of objects or None following order of ids in ids
@@ -67,7 +80,7 @@ class GraphQLDataBuilder:
             # use different loaders for different combinations of requested props
             if loader_key not in info.context:
                 info.context[loader_key] = aiodataloader.DataLoader(
-                    get_entities_wrapper(props)
+                    get_entities_wrapper(self.__class__._get_data_manager(info), props)
                 )
             return await info.context[loader_key].load(id)
 
@@ -82,12 +95,16 @@ class GraphQLDataBuilder:
         self,
         entity_type_name: str,
     ):
-        async def post_entity(input: typing.Dict, props: typing.List[str]):
-            return await self._data_manager.post_entity(entity_type_name, input, props)
+        async def post_entity(
+            data_manager: DataManager, input: typing.Dict, props: typing.List[str]
+        ):
+            return await data_manager.post_entity(entity_type_name, input, props)
 
         async def resolver(_, info, input):
             props = self.__class__._get_requested_entity_props(info)
-            return await post_entity(input, props)
+            return await post_entity(
+                self.__class__._get_data_manager(info), input, props
+            )
 
         return resolver
 
@@ -96,17 +113,20 @@ class GraphQLDataBuilder:
         entity_type_name: str,
     ):
         async def put_entity(
+            data_manager: DataManager,
             entity_id: int,
             input: typing.Dict,
             props: typing.List[str],
         ):
-            return await self._data_manager.put_entity(
+            return await data_manager.put_entity(
                 entity_type_name, entity_id, input, props
             )
 
         async def resolver(_, info, id, input):
             props = self.__class__._get_requested_entity_props(info)
-            return await put_entity(id, input, props)
+            return await put_entity(
+                self.__class__._get_data_manager(info), id, input, props
+            )
 
         return resolver
 
@@ -114,11 +134,11 @@ class GraphQLDataBuilder:
         self,
         entity_type_name: str,
     ):
-        async def delete_entity(entity_id: int):
-            return await self._data_manager.delete_entity(entity_type_name, entity_id)
+        async def delete_entity(data_manager: DataManager, entity_id: int):
+            return await data_manager.delete_entity(entity_type_name, entity_id)
 
-        async def resolver(_, __, id):
-            return await delete_entity(id)
+        async def resolver(_, info, id):
+            return await delete_entity(self.__class__._get_data_manager(info), id)
 
         return resolver
 
@@ -127,30 +147,33 @@ class GraphQLDataBuilder:
         relation_type_name: str,
         inverse: bool = False,
     ):
-        async def get_relations(keys: typing.List[str]):
-            grouped_ids = {}
-            for key in keys:
-                (entity_type_name, entity_id__str) = key.split("|")
-                if entity_type_name not in grouped_ids:
-                    grouped_ids[entity_type_name] = []
-                grouped_ids[entity_type_name].append(int(entity_id__str))
-            grouped_data = {}
-            for entity_type_name, entity_ids in grouped_ids.items():
-                grouped_data[entity_type_name] = await self._data_manager.get_relations(
-                    entity_type_name,
-                    entity_ids,
-                    relation_type_name,
-                    inverse,
-                )
-            # dataloader expects sequence of objects or None following order of ids in ids
-            results = []
-            for key in keys:
-                (entity_type_name, entity_id__str) = key.split("|")
-                results.append(
-                    grouped_data.get(entity_type_name).get(int(entity_id__str), [])
-                )
+        def get_relations_wrapper(data_manager: DataManager):
+            async def get_relations(keys: typing.List[str]):
+                grouped_ids = {}
+                for key in keys:
+                    (entity_type_name, entity_id__str) = key.split("|")
+                    if entity_type_name not in grouped_ids:
+                        grouped_ids[entity_type_name] = []
+                    grouped_ids[entity_type_name].append(int(entity_id__str))
+                grouped_data = {}
+                for entity_type_name, entity_ids in grouped_ids.items():
+                    grouped_data[entity_type_name] = await data_manager.get_relations(
+                        entity_type_name,
+                        entity_ids,
+                        relation_type_name,
+                        inverse,
+                    )
+                # dataloader expects sequence of objects or None following order of ids in ids
+                results = []
+                for key in keys:
+                    (entity_type_name, entity_id__str) = key.split("|")
+                    results.append(
+                        grouped_data.get(entity_type_name).get(int(entity_id__str), [])
+                    )
+
+                return results
 
-            return results
+            return get_relations
 
         async def load_relation(
             info, entity_type_name: str, id: int
@@ -159,7 +182,9 @@ class GraphQLDataBuilder:
                 f"__relation_loader_{self._project_name}_{relation_type_name}_{inverse}"
             )
             if loader_key not in info.context:
-                info.context[loader_key] = aiodataloader.DataLoader(get_relations)
+                info.context[loader_key] = aiodataloader.DataLoader(
+                    get_relations_wrapper(self.__class__._get_data_manager(info))
+                )
             return await info.context[loader_key].load(f"{entity_type_name}|{id}")
 
         async def resolver(parent, info, **_):
@@ -448,9 +473,27 @@ class GraphQLDataBuilder:
                     [f"ri_{rtn}_s", "String"],
                 )
 
-    # TODO: reset cache when project is updated or user permissions have been updated
-    @aiocache.cached(key_builder=create_schema_key_builder)
+    async def get_graphql_handler(self) -> GraphQLHandler:
+        config_version = await self._config_manager.get_config_version(
+            self._project_name
+        )
+        # The schema only depends on the permissions of the user for this project
+        permissions = self._user.permissions.get(self._project_name, {})
+        key = create_schema_key_builder(
+            self._create_schema, self, config_version, permissions
+        )
+        handler = _handlers.get(key)
+        if handler is None:
+            handler = GraphQLHandler(
+                await self._create_schema(), context_value=get_context_value
+            )
+            _handlers.set(key, handler)
+        return handler
+
     async def create_schema(self):
+        return (await self.get_graphql_handler()).schema
+
+    async def _create_schema(self):
         self._entity_types_config = await self._config_manager.get_entity_types_config(
             self._project_name
         )
@@ -6,9 +6,11 @@ from fastapi.responses import JSONResponse
 from fastapi_jwt_auth import AuthJWT
 from pydantic import BaseModel
 
+from app.auth.denylist import denylist_connect, denylist_disconnect
 from app.config import ALLOWED_ORIGINS, SECRET_KEY
 from app.db.core import db_connect, db_disconnect
 from app.es.core import es_connect, es_disconnect
+from app.mgmt.outbox import outbox_connect, outbox_disconnect
 from app.router.auth.v1 import router as router_auth_v1
 from app.router.config.v1 import router as router_config_v1
 from app.router.data.v1 import router as router_data_v1
@@ -49,11 +51,15 @@ def get_config():
 @app.on_event("startup")
 async def startup():
     await db_connect(app)
+    await denylist_connect(app)
     es_connect(app)
+    await outbox_connect(app)
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await outbox_disconnect(app)
+    await denylist_disconnect(app)
     await db_disconnect(app)
     await es_disconnect(app)
 
@@ -1,3 +1,9 @@
+import asyncio
+import concurrent.futures
+import logging
+import time
+import typing
+
 import aiocache
 import fastapi
 import starlette
@@ -6,12 +12,48 @@ from fastapi_jwt_auth.auth_jwt import AuthJWT
 from fastapi_jwt_auth.exceptions import JWTDecodeError, MissingTokenError
 from passlib.context import CryptContext
 
-from app.cache.core import get_permissions_key_builder
+from app.auth.denylist import get_denylist_from_request
+from app.cache.core import get_permissions_key_builder, skip_self_key_builder
 from app.db.auth import AuthRepository
 from app.db.core import get_repository_from_request
 from app.mgmt.config import ConfigManager
 from app.models.auth import User, UserWithPermissions
 
+logger = logging.getLogger(__name__)
+
+# Number of threads verifying passwords (bcrypt is CPU-bound, but releases the GIL)
+PASSWORD_THREADS = 2
+# Number of logins handled concurrently, others wait
+LOGIN_CONCURRENCY = 8
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_password_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=PASSWORD_THREADS, thread_name_prefix="password"
+)
+# Created on first use, in the running event loop
+_login_semaphore = None
+
+
+def _get_login_semaphore() -> asyncio.Semaphore:
+    global _login_semaphore
+    if _login_semaphore is None:
+        _login_semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY)
+    return _login_semaphore
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    # Don't block the event loop while hashing
+    start = time.perf_counter()
+    result = await asyncio.get_running_loop().run_in_executor(
+        _password_executor, pwd_context.verify, password, hashed_password
+    )
+    logger.debug("Password verification: %.3fs", time.perf_counter() - start)
+    return result
+
+
+# Number of seconds user records are cached (e.g., disabling a user can take this long to take effect)
+USER_TTL = 60
+
 
 class AuthManager:
     def __init__(
@@ -20,39 +62,79 @@ class AuthManager:
     ):
         self._auth_repo = get_repository_from_request(request, AuthRepository)
         self._config_manager = ConfigManager(request)
+        self._denylist = get_denylist_from_request(request)
 
     async def authenticate_user(
         self,
         username: str,
         password: str,
     ):
-        user = await self._auth_repo.get_user_with_hashed_password(
-            username=username.lower()
-        )
+        # Limit the number of concurrent logins, so login bursts can't take over the worker
+        start = time.perf_counter()
+        async with _get_login_semaphore():
+            waited = time.perf_counter() - start
 
-        if user is None:
-            raise HTTPException(
-                status_code=400, detail="Incorrect username or password"
+            user = await self._auth_repo.get_user_with_hashed_password(
+                username=username.lower()
             )
 
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        if not pwd_context.verify(password, user.hashed_password):
+            if user is None:
+                raise HTTPException(
+                    status_code=400, detail="Incorrect username or password"
+                )
+
+            verified = await verify_password(password, user.hashed_password)
+
+        logger.debug(
+            "Login of %s: waited %.3fs, total %.3fs",
+            username,
+            waited,
+            time.perf_counter() - start,
+        )
+
+        if not verified:
             raise HTTPException(
                 status_code=400, detail="Incorrect username or password"
             )
 
         return user
 
-    # TODO: clear cache if user permissions are modified
-    @aiocache.cached(key_builder=get_permissions_key_builder)
+    @aiocache.cached(key_builder=skip_self_key_builder, ttl=USER_TTL)
+    async def _get_user(self, username: str) -> typing.Optional[User]:
+        return await self._auth_repo.get_user(username=username)
+
     async def _get_permissions(
         self,
         user: User,
+    ):
+        config_version = await self._config_manager.get_projects_config_version()
+        return await self._get_user_permissions(user, config_version)
+
+    # TODO: clear cache if user groups are modified
+    @aiocache.cached(key_builder=get_permissions_key_builder)
+    async def _get_user_permissions(
+        self,
+        user: User,
+        config_version: str,
     ):
         user_groups = await self._auth_repo.get_groups(user)
-        projects = await self._config_manager.get_projects_config()
+        permissions_index = await self._get_permissions_index(config_version)
 
+        # A user is granted all permissions of all its groups
         permissions = {}
+        for group in sorted(set(user_groups)):
+            if group in permissions_index:
+                _merge_permissions(permissions, permissions_index[group])
+
+        return permissions
+
+    # The config version is only used as cache key
+    @aiocache.cached(key_builder=skip_self_key_builder)
+    async def _get_permissions_index(self, config_version: str):
+        """Get the permissions granted to each group, by group id."""
+        projects = await self._config_manager.get_projects_config()
+
+        index = {}
         for project_name in projects:
             if project_name == "__all__":
                 continue
@@ -66,68 +148,43 @@ class AuthManager:
                 ),
             }.items():
                 for tn, tc in config.items():
-                    # data
-                    if "data" in tc["config"] and "permissions" in tc["config"]["data"]:
-                        for permission, groups in tc["config"]["data"][
+                    for section in ["data", "es_data"]:
+                        if (
+                            section not in tc["config"]
+                            or "permissions" not in tc["config"][section]
+                        ):
+                            continue
+
+                        for permission, groups in tc["config"][section][
                             "permissions"
                         ].items():
                             for group in groups:
-                                if group not in user_groups:
-                                    continue
-
-                                # Entity permissions
-                                if project_name not in permissions:
-                                    permissions[project_name] = {}
-                                if er not in permissions[project_name]:
-                                    permissions[project_name][er] = {}
-                                if tn not in permissions[project_name][er]:
-                                    permissions[project_name][er][tn] = {}
-                                if "data" not in permissions[project_name][er][tn]:
-                                    permissions[project_name][er][tn]["data"] = {}
-                                permissions[project_name][er][tn]["data"][
-                                    permission
-                                ] = []
-
-                                # Field permissions
-                                if "fields" not in tc["config"]["data"]:
-                                    continue
-
-                                for field in tc["config"]["data"]["fields"].values():
-                                    if (
-                                        "permissions" in field
+                                # Field permissions (data only)
+                                fields = []
+                                if (
+                                    section == "data"
+                                    and "fields" in tc["config"]["data"]
+                                ):
+                                    fields = [
+                                        field["system_name"]
+                                        for field in tc["config"]["data"][
+                                            "fields"
+                                        ].values()
+                                        if "permissions" in field
                                         and permission in field["permissions"]
                                         and group in field["permissions"][permission]
-                                    ):
-                                        permissions[project_name][er][tn]["data"][
-                                            permission
-                                        ].append(field["system_name"])
-
-                    # es_data
-                    if (
-                        "es_data" in tc["config"]
-                        and "permissions" in tc["config"]["es_data"]
-                    ):
-                        for permission, groups in tc["config"]["es_data"][
-                            "permissions"
-                        ].items():
-                            for group in groups:
-                                if group not in user_groups:
-                                    continue
-
-                                # Entity permissions
-                                if project_name not in permissions:
-                                    permissions[project_name] = {}
-                                if er not in permissions[project_name]:
-                                    permissions[project_name][er] = {}
-                                if tn not in permissions[project_name][er]:
-                                    permissions[project_name][er][tn] = {}
-                                if "es_data" not in permissions[project_name][er][tn]:
-                                    permissions[project_name][er][tn]["es_data"] = {}
-                                permissions[project_name][er][tn]["es_data"][
-                                    permission
-                                ] = []
+                                    ]
 
-        return permissions
+                                group_permissions = (
+                                    index.setdefault(group, {})
+                                    .setdefault(project_name, {})
+                                    .setdefault(er, {})
+                                    .setdefault(tn, {})
+                                    .setdefault(section, {})
+                                )
+                                group_permissions[permission] = fields
+
+        return index
 
     async def get_current_active_user_with_permissions(
         self,
@@ -141,7 +198,7 @@ class AuthManager:
         try:
             Authorize.jwt_required()
         except MissingTokenError:
-            user = await self._auth_repo.get_user(username="anonymous")
+            user = await self._get_user("anonymous")
         except JWTDecodeError:
             raise HTTPException(
                 status_code=401, detail="Could not validate credentials"
@@ -152,14 +209,11 @@ class AuthManager:
             # Validate if tokens have been denied
             # fastapi-jwt-auth deny list can't be used because of
             # https://github.com/IndominusByte/fastapi-jwt-auth/issues/30
-            await self._auth_repo.denylist_purge_expired_tokens()
-            if not await self._auth_repo.denylist_check_token(
-                Authorize.get_raw_jwt()["jti"]
-            ):
+            if await self._denylist.is_denied(Authorize.get_raw_jwt()["jti"]):
                 raise HTTPException(status_code=401, detail="Inactive token")
 
             # Load user
-            user = await self._auth_repo.get_user(username=Authorize.get_jwt_subject())
+            user = await self._get_user(Authorize.get_jwt_subject())
 
         if user.disabled:
             raise HTTPException(status_code=401, detail="Inactive user")
@@ -177,18 +231,29 @@ class AuthManager:
         raw_jwt = Authorize.get_raw_jwt()
         if raw_jwt["type"] == "access":
             print("revoking access token")
-            await self._auth_repo.denylist_add_token(
+            await self._denylist.add(
                 raw_jwt["jti"], Authorize._access_token_expires.seconds
             )
         elif raw_jwt["type"] == "refresh":
             print("revoking refresh token")
-            await self._auth_repo.denylist_add_token(
+            await self._denylist.add(
                 raw_jwt["jti"], Authorize._refresh_token_expires.seconds
             )
         else:
             raise Exception(f'Unkown token type: {raw_jwt["type"]}')
 
 
+def _merge_permissions(
+    permissions: typing.Dict, additional_permissions: typing.Dict
+) -> None:
+    for key, value in additional_permissions.items():
+        if isinstance(value, dict):
+            _merge_permissions(permissions.setdefault(key, {}), value)
+        else:
+            fields = permissions.setdefault(key, [])
+            fields.extend([field for field in value if field not in fields])
+
+
 async def get_current_active_user_with_permissions(
     request: starlette.requests.Request,
     Authorize: AuthJWT = fastapi.Depends(),
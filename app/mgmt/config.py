@@ -14,7 +14,13 @@ from app.cache.core import (
 from app.db.config import ConfigRepository
 from app.db.core import get_repository_from_request
 from app.models.auth import UserWithPermissions
-from app.utils import dtu
+from app.utils import RE_FIELD_ID, dtu
+
+# Number of seconds a config version is cached before checking for config updates
+CONFIG_VERSION_TTL = 30
+
+# Last config version seen by this process, by project name
+_config_versions = {}
 
 
 class ConfigManager:
@@ -26,6 +32,33 @@ class ConfigManager:
         self._user = user
         self._config_repo = get_repository_from_request(request, ConfigRepository)
 
+    @aiocache.cached(key_builder=skip_self_key_builder, ttl=CONFIG_VERSION_TTL)
+    async def _get_config_version(self, project_name: str) -> str:
+        return await self._config_repo.get_config_version(project_name)
+
+    async def get_config_version(self, project_name: str) -> str:
+        """Get the current config version of a project.
+
+        If the config has been updated since the previous check, all cached configs (and everything derived from
+        them) are cleared.
+        """
+        version = await self._get_config_version(project_name)
+        if _config_versions.get(project_name, version) != version:
+            # The in-memory backend is shared by all cached functions
+            await self.__class__._get_config_version.cache.clear()
+        _config_versions[project_name] = version
+        return version
+
+    async def get_projects_config_version(self) -> str:
+        """Get a version covering the configs of all projects."""
+        projects_config = await self.get_projects_config()
+        return "|".join(
+            [
+                await self.get_config_version(project_name)
+                for project_name in sorted(projects_config)
+            ]
+        )
+
     # TODO: delete cache on project config update
     @aiocache.cached(key_builder=no_arg_key_builder)
     async def get_projects_config(self) -> typing.Dict:
@@ -118,6 +151,70 @@ class ConfigManager:
 
         return result
 
+    @aiocache.cached(key_builder=skip_self_key_builder)
+    async def get_es_dependency_index(
+        self, project_name: str
+    ) -> typing.Dict[str, typing.List[typing.Tuple[str, str, typing.Optional[str]]]]:
+        """Get the Elasticsearch fields depending on each property and (inverse) relation type id.
+
+        Returns:
+            typing.Dict[str, typing.List[typing.Tuple[str, str, typing.Optional[str]]]]: For each field id ($id,
+                $r_id or $ri_id), the entity type id, Elasticsearch field system name and selector value used to
+                find the entities to update.
+        """
+        index = {}
+
+        def add(field_ids_in: str, *dependency) -> None:
+            for match in RE_FIELD_ID.finditer(field_ids_in):
+                dependencies = index.setdefault(match.group(0), [])
+                if dependency not in dependencies:
+                    dependencies.append(dependency)
+
+        for etd in (await self.get_entity_types_config(project_name)).values():
+            for es_field_def in etd["config"]["es_data"]["fields"]:
+                es_field_system_name = es_field_def["system_name"]
+                if es_field_def["type"] in [
+                    "nested",
+                    "nested_flatten",
+                    "nested_multi_type",
+                ]:
+                    # If added or removed relation in base: update complete nested field
+                    # The field id will start with $r, so a selector value is not needed
+                    add(es_field_def["base"], etd["id"], es_field_system_name, None)
+                    for part in es_field_def["parts"].values():
+                        if not RE_FIELD_ID.search(part):
+                            continue
+                        selector_values = [part]
+                        if "filter" in es_field_def:
+                            selector_values.append(es_field_def["filter"])
+                        for selector_value in selector_values:
+                            if selector_value[0] == ".":
+                                selector_value = (
+                                    f"{es_field_def['base']}{selector_value}"
+                                )
+                            else:
+                                selector_value = (
+                                    f"{es_field_def['base']}->{selector_value}"
+                                )
+                            add(part, etd["id"], es_field_system_name, selector_value)
+                elif es_field_def["type"] == "edtf_interval":
+                    for key in ["start", "end"]:
+                        add(
+                            es_field_def[key],
+                            etd["id"],
+                            es_field_system_name,
+                            es_field_def[key],
+                        )
+                else:
+                    add(
+                        es_field_def["selector_value"],
+                        etd["id"],
+                        es_field_system_name,
+                        es_field_def["selector_value"],
+                    )
+
+        return index
+
     # TODO: delete cache on entity config update
     @aiocache.cached(key_builder=skip_self_key_builder)
     async def get_entity_type_property_mapping(
@@ -1,3 +1,5 @@
+import contextlib
+import functools
 import json
 import re
 import typing
@@ -10,8 +12,17 @@ import starlette
 
 from app.db.core import get_repository_from_request
 from app.db.data import DataRepository
+from app.db.outbox import EsOutboxRepository
 from app.es.base import BaseElasticsearch
 from app.es.core import get_es_from_request
+from app.es.pipeline import (
+    CONVERT_CONCURRENCY,
+    FETCH_CONCURRENCY,
+    BulkPipeline,
+    batched,
+    convert_executor,
+    convert_in_worker,
+)
 from app.mgmt.auth import allowed_entities_or_relations_and_properties
 from app.mgmt.config import ConfigManager
 from app.mgmt.revision import RevisionManager
@@ -39,6 +50,9 @@ class DataManager:
         self._data_repo: DataRepository = get_repository_from_request(
             request, DataRepository
         )
+        self._outbox_repo: EsOutboxRepository = get_repository_from_request(
+            request, EsOutboxRepository
+        )
         self._es = get_es_from_request(request, BaseElasticsearch)
         self._user = user
         self._entity_types_config = None
@@ -909,7 +923,7 @@ class DataManager:
                     connection,
                 )
 
-                await self.update_es(es_query, connection)
+                await self.add_es_query_to_outbox(es_query, connection)
 
         return (
             await self.get_entities(
@@ -1019,7 +1033,7 @@ class DataManager:
                     connection,
                 )
 
-                await self.update_es(es_query, connection)
+                await self.add_es_query_to_outbox(es_query, connection)
 
         return (
             await self.get_entities(
@@ -1067,15 +1081,27 @@ class DataManager:
                 old_raw_relations = await self._data_repo.get_all_entity_relations(
                     await self._get_project_id(), entity_type_id, entity_id, connection
                 )
+                # Resolve the type ids of all relations and related entities at once
+                type_ids = iter(
+                    await self._data_repo.get_type_ids_from_graph_ids(
+                        await self._get_project_id(),
+                        [
+                            graph_id
+                            for old_raw_relation in old_raw_relations
+                            for graph_id in [
+                                old_raw_relation["id"],
+                                old_raw_relation["start_id"],
+                                old_raw_relation["end_id"],
+                            ]
+                        ],
+                        connection=connection,
+                    )
+                )
                 grouped_relation_ids = {}
                 relations = {}
                 for old_raw_relation in old_raw_relations:
                     relation_graph_id = old_raw_relation["id"]
-                    relation_type_id = await self._data_repo.get_type_id_from_graph_id(
-                        await self._get_project_id(),
-                        relation_graph_id,
-                        connection,
-                    )
+                    relation_type_id = next(type_ids)
                     if relation_type_id not in grouped_relation_ids:
                         grouped_relation_ids[relation_type_id] = {
                             "nids": [],
@@ -1091,6 +1117,8 @@ class DataManager:
                     relations[relation_graph_id] = {
                         "relation_type_id": relation_type_id,
                         "properties": properties,
+                        "start_entity_type_id": next(type_ids),
+                        "end_entity_type_id": next(type_ids),
                         "start_id": old_raw_relation["start_id"],
                         "start_properties": json.loads(
                             old_raw_relation["start_properties"]
@@ -1128,20 +1156,8 @@ class DataManager:
                     revisions["relations"][relation_type_name] = {}
                     for nid in ids["nids"]:
                         relation = relations[nid]
-                        start_entity_type_id = (
-                            await self._data_repo.get_type_id_from_graph_id(
-                                await self._get_project_id(),
-                                relation["start_id"],
-                                connection,
-                            )
-                        )
-                        end_entity_type_id = (
-                            await self._data_repo.get_type_id_from_graph_id(
-                                await self._get_project_id(),
-                                relation["end_id"],
-                                connection,
-                            )
-                        )
+                        start_entity_type_id = relation["start_entity_type_id"]
+                        end_entity_type_id = relation["end_entity_type_id"]
                         revisions["relations"][relation_type_name][
                             relation["properties"]["id"]
                         ] = [
@@ -1242,7 +1258,7 @@ class DataManager:
                     connection,
                 )
 
-                await self.update_es(es_query, connection)
+                await self.add_es_query_to_outbox(es_query, connection)
 
     async def _get_relations_triplehop(
         self,
@@ -1297,17 +1313,57 @@ class DataManager:
             connection=connection,
         )
 
+        return await self._relation_records_to_results(records, connection)
+
+    async def _get_relations_triplehop_batch(
+        self,
+        branches: typing.List[typing.Tuple[str, typing.List[int], str]],
+        connection: asyncpg.Connection = None,
+    ) -> typing.List[typing.Dict]:
+        """
+        Get relations and linked entity information for multiple (entity_type_id, entity_ids, relation_type_id)
+        branches using a single query. The relation type id is prefixed with r_ or ri_ (as in triplehop queries).
+
+        Return: List with a Dict for each branch, see _get_relations_triplehop.
+        """
+        records_per_branch = (
+            await self._data_repo.get_relations_from_start_entities_batch(
+                await self._get_project_id(),
+                [
+                    (
+                        entity_type_id,
+                        entity_ids,
+                        relation_type_id.split("_")[1],
+                        relation_type_id.split("_")[0] == "ri",
+                    )
+                    for (entity_type_id, entity_ids, relation_type_id) in branches
+                ],
+                connection=connection,
+            )
+        )
+
+        return [
+            await self._relation_records_to_results(records, connection)
+            for records in records_per_branch
+        ]
+
+    async def _relation_records_to_results(
+        self,
+        records: typing.List[asyncpg.Record],
+        connection: asyncpg.Connection = None,
+    ) -> typing.Dict:
+        etids = await self._data_repo.get_type_ids_from_graph_ids(
+            await self._get_project_id(),
+            [record["n_id"] for record in records],
+            connection=connection,
+        )
+
         # build temporary dict so json only needs to be loaded once
         results = {}
-        for record in records:
+        for record, etid in zip(records, etids):
             entity_id = record["id"]
             relation_properties = json.loads(record["e_properties"])
             entity_properties = json.loads(record["n_properties"])
-            etid = await self._data_repo.get_type_id_from_graph_id(
-                await self._get_project_id(),
-                record["n_id"],
-                connection=connection,
-            )
 
             if entity_id not in results:
                 results[entity_id] = {}
@@ -1356,9 +1412,14 @@ class DataManager:
                 relation_ids,
             )
 
+        source_etids = await self._data_repo.get_type_ids_from_graph_ids(
+            await self._get_project_id(),
+            [source_record["n_id"] for source_record in source_records],
+        )
+
         # build temporary dict so sources can easily be retrieved
         source_results = {}
-        for source_record in source_records:
+        for source_record, source_etid in zip(source_records, source_etids):
             rel_id = source_record["id"]
             if rel_id not in source_results:
                 source_results[rel_id] = []
@@ -1367,10 +1428,7 @@ class DataManager:
                 {
                     "r_props": json.loads(source_record["e_properties"]),
                     "e_props": json.loads(source_record["n_properties"]),
-                    "entity_type_id": await self._data_repo.get_type_id_from_graph_id(
-                        await self._get_project_id(),
-                        source_record["n_id"],
-                    ),
+                    "entity_type_id": source_etid,
                 }
             )
 
@@ -1490,6 +1548,30 @@ class DataManager:
             ),
         )
 
+    async def count_entities_by_type_name(
+        self,
+        entity_type_name: str,
+    ) -> int:
+        return await self._data_repo.count_entities(
+            await self._get_project_id(),
+            await self._config_manager.get_entity_type_id_by_name(
+                self._project_name, entity_type_name
+            ),
+        )
+
+    async def iter_entity_ids_by_type_name(
+        self,
+        entity_type_name: str,
+    ) -> typing.AsyncIterator[int]:
+        async for page in self._data_repo.iter_entity_ids(
+            await self._get_project_id(),
+            await self._config_manager.get_entity_type_id_by_name(
+                self._project_name, entity_type_name
+            ),
+        ):
+            for entity_id in page:
+                yield entity_id
+
     async def get_entity_data(
         self,
         entity_ids: typing.List[int],
@@ -1509,11 +1591,12 @@ class DataManager:
             entity_type_name, entity_type_id
         )
 
-        entity_type_name_or_id = {}
-        if entity_type_name is not None:
-            entity_type_name_or_id["entity_type_name"] = entity_type_name
-        elif entity_type_id is not None:
-            entity_type_name_or_id["entity_type_id"] = entity_type_id
+        if entity_type_id is None:
+            entity_type_id = await self._config_manager.get_entity_type_id_by_name(
+                self._project_name,
+                entity_type_name,
+                connection=connection,
+            )
 
         results = {entity_id: {} for entity_id in entity_ids}
         # start entity
@@ -1521,89 +1604,74 @@ class DataManager:
             # check if entity props are requested
             if triplehop_query["e_props"]:
                 results = await self._get_entities_triplehop(
-                    entity_ids, **entity_type_name_or_id, connection=connection
+                    entity_ids, entity_type_id=entity_type_id, connection=connection
                 )
 
-        for relation_type_id in triplehop_query["relations"]:
-            # get relation data
-            raw_results = await self._get_relations_triplehop(
-                entity_ids,
-                relation_type_id.split("_")[0] == "ri",
-                **entity_type_name_or_id,
-                relation_type_id=relation_type_id.split("_")[1],
-                connection=connection,
+        # The query tree is resolved level by level, using a single query for all relation types on a level.
+        # A node on a level consists of an entity type id, entity ids, their results and the (partial) query.
+        level = [(entity_type_id, entity_ids, results, triplehop_query)]
+        # Additional relation data for a relation (identified by its raw result) can only be added
+        # when the next levels have been resolved => keep track of (raw_result, rel_results, rel_entity_id)
+        additions = []
+        while level:
+            branches = [
+                (node_entity_type_id, node_entity_ids, relation_type_id)
+                for (node_entity_type_id, node_entity_ids, _, query) in level
+                for relation_type_id in query["relations"]
+            ]
+            if not branches:
+                break
+
+            raw_results_per_branch = iter(
+                await self._get_relations_triplehop_batch(branches, connection)
             )
-            for entity_id, raw_result in raw_results.items():
-                if "relations" not in results[entity_id]:
-                    results[entity_id]["relations"] = {}
-                results[entity_id]["relations"][relation_type_id] = raw_result
-
-            # gather what further information is required
-            rel_entities = {}
-            raw_rel_results_per_entity_type_id = {}
-            # mapping so results (identified by entity_type_name, entity_id)
-            # can be added in the right place (identified by relation_type_id, relation_id)
-            mapping = {}
-            if triplehop_query["relations"][relation_type_id]["relations"]:
-                for entity_id, raw_relation_results in raw_results.items():
-                    for relation_id, raw_result in raw_relation_results.items():
-                        rel_entity_type_id = raw_result["entity_type_id"]
-                        rel_entity_id = raw_result["e_props"]["id"]
-
-                        if rel_entity_type_id not in rel_entities:
-                            rel_entities[rel_entity_type_id] = set()
-                        rel_entities[rel_entity_type_id].add(rel_entity_id)
-
-                        if relation_type_id not in mapping:
-                            mapping[relation_type_id] = {}
-                        mapping[relation_type_id][relation_id] = [
-                            rel_entity_type_id,
-                            rel_entity_id,
-                        ]
-
-                # recursively obtain further relation data
-                for rel_entity_type_id, rel_entity_ids in rel_entities.items():
-                    raw_rel_results_per_entity_type_id[
-                        rel_entity_type_id
-                    ] = await self.get_entity_data(
-                        list(rel_entity_ids),
-                        triplehop_query["relations"][relation_type_id],
-                        False,
-                        entity_type_id=rel_entity_type_id,
-                        connection=connection,
-                    )
 
-                # add the additional relation data to the result
-                for entity_id in results:
-                    if (
-                        "relations" in results[entity_id]
-                        and relation_type_id in results[entity_id]["relations"]
-                    ):
-                        for relation_id in results[entity_id]["relations"][
+            next_level = []
+            for (_, _, node_results, query) in level:
+                for relation_type_id, relation_query in query["relations"].items():
+                    raw_results = next(raw_results_per_branch)
+                    for entity_id, raw_result in raw_results.items():
+                        if "relations" not in node_results[entity_id]:
+                            node_results[entity_id]["relations"] = {}
+                        node_results[entity_id]["relations"][
                             relation_type_id
-                        ]:
-                            (rel_entity_type_id, rel_entity_id) = mapping[
-                                relation_type_id
-                            ][relation_id]
-                            if (
-                                rel_entity_id
-                                in raw_rel_results_per_entity_type_id[
-                                    rel_entity_type_id
-                                ]
-                                and "relations"
-                                in raw_rel_results_per_entity_type_id[
-                                    rel_entity_type_id
-                                ][rel_entity_id]
-                            ):
-                                results[entity_id]["relations"][relation_type_id][
-                                    relation_id
-                                ]["relations"] = raw_rel_results_per_entity_type_id[
-                                    rel_entity_type_id
-                                ][
-                                    rel_entity_id
-                                ][
-                                    "relations"
-                                ]
+                        ] = raw_result
+
+                    # gather what further information is required
+                    if not relation_query["relations"]:
+                        continue
+                    rel_results_per_entity_type_id = {}
+                    for raw_relation_results in raw_results.values():
+                        for raw_result in raw_relation_results.values():
+                            rel_entity_type_id = raw_result["entity_type_id"]
+                            rel_entity_id = raw_result["e_props"]["id"]
+
+                            if rel_entity_type_id not in rel_results_per_entity_type_id:
+                                rel_results_per_entity_type_id[rel_entity_type_id] = {}
+                            rel_results = rel_results_per_entity_type_id[
+                                rel_entity_type_id
+                            ]
+                            rel_results[rel_entity_id] = {}
+                            additions.append((raw_result, rel_results, rel_entity_id))
+
+                    for (
+                        rel_entity_type_id,
+                        rel_results,
+                    ) in rel_results_per_entity_type_id.items():
+                        next_level.append(
+                            (
+                                rel_entity_type_id,
+                                list(rel_results.keys()),
+                                rel_results,
+                                relation_query,
+                            )
+                        )
+            level = next_level
+
+        # add the additional relation data to the result
+        for (raw_result, rel_results, rel_entity_id) in additions:
+            if "relations" in rel_results[rel_entity_id]:
+                raw_result["relations"] = rel_results[rel_entity_id]["relations"]
 
         return results
 
@@ -1665,31 +1733,11 @@ class DataManager:
             diff_field_ids.append(f"$r_{r_diff_id}")
             diff_field_ids.append(f"$ri_{r_diff_id}")
 
-        async def add_entities_and_field_to_update(
+        def add_entities_and_field_to_update(
             es_entity_type_id: str,
-            diff_field_id: str,
             es_field_system_name: str,
-            selector_value: str = None,
+            entity_ids: typing.Iterable[int],
         ) -> None:
-            if diff_field_id[:2] != "$r":
-                entity_ids = await self.find_entities_to_update(
-                    es_entity_type_id,
-                    entities_or_relations,
-                    type_id,
-                    id,
-                    selector_value,
-                    diff_field_id,
-                    connection,
-                )
-            else:
-                entity_ids = await self.find_entities_to_update_for_relation(
-                    es_entity_type_id,
-                    type_id,
-                    id,
-                    diff_field_id,
-                    connection,
-                )
-
             for e_id in entity_ids:
                 action = "update"
                 if e_id == new_id:
@@ -1705,86 +1753,54 @@ class DataManager:
                 if action != "delete":
                     es_query[action][es_entity_type_id][e_id].add(es_field_system_name)
 
-        for es_etn, etd in (await self._get_entity_types_config()).items():
-            if "config" in etd:
-                es_entity_type_id = (
-                    await self._config_manager.get_entity_type_id_by_name(
-                        self._project_name,
-                        es_etn,
+        # Relation paths to the modified entity or relation, for each entity type to update,
+        # together with the Elasticsearch field depending on them
+        paths_to_update = {}
+        es_dependency_index = await self._config_manager.get_es_dependency_index(
+            self._project_name
+        )
+        for diff_field_id in diff_field_ids:
+            for (
+                es_entity_type_id,
+                es_field_system_name,
+                selector_value,
+            ) in es_dependency_index.get(diff_field_id, []):
+                if diff_field_id[:2] == "$r":
+                    paths = [[diff_field_id]]
+                else:
+                    (self_to_update, paths,) = self.__class__.get_paths_to_update(
+                        entities_or_relations,
+                        selector_value,
+                        diff_field_id,
                     )
+                    if self_to_update:
+                        add_entities_and_field_to_update(
+                            es_entity_type_id, es_field_system_name, [id]
+                        )
+                paths_to_update.setdefault(es_entity_type_id, []).extend(
+                    [(path, es_field_system_name) for path in paths]
                 )
 
-                if "es_data" in etd["config"]:
-                    # TODO: merge with es.base.extract_query_from_es_data_config?
-                    for es_field_def in etd["config"]["es_data"]["fields"]:
-                        if es_field_def["type"] in [
-                            "nested",
-                            "nested_flatten",
-                            "nested_multi_type",
-                        ]:
-                            # If added or removed relation in base:
-                            # update complete nested field
-                            # diff_field_id will start with $r, so a selector_value is not needed
-                            for diff_field_id in diff_field_ids:
-                                if diff_field_id in es_field_def["base"]:
-                                    await add_entities_and_field_to_update(
-                                        es_entity_type_id,
-                                        diff_field_id,
-                                        es_field_def["system_name"],
-                                    )
-                            for part in es_field_def["parts"].values():
-                                for diff_field_id in diff_field_ids:
-                                    if diff_field_id in part:
-                                        if part[0] == ".":
-                                            selector_value = (
-                                                f"{es_field_def['base']}{part}"
-                                            )
-                                        else:
-                                            selector_value = (
-                                                f"{es_field_def['base']}->{part}"
-                                            )
-                                        await add_entities_and_field_to_update(
-                                            es_entity_type_id,
-                                            diff_field_id,
-                                            es_field_def["system_name"],
-                                            selector_value,
-                                        )
-                                        if "filter" in es_field_def:
-                                            if es_field_def["filter"][0] == ".":
-                                                selector_value = f"{es_field_def['base']}{es_field_def['filter']}"
-                                            else:
-                                                selector_value = f"{es_field_def['base']}->{es_field_def['filter']}"
-                                            await add_entities_and_field_to_update(
-                                                es_entity_type_id,
-                                                diff_field_id,
-                                                es_field_def["system_name"],
-                                                selector_value,
-                                            )
-                        elif es_field_def["type"] == "edtf_interval":
-                            for diff_field_id in diff_field_ids:
-                                if diff_field_id in es_field_def["start"]:
-                                    await add_entities_and_field_to_update(
-                                        es_entity_type_id,
-                                        diff_field_id,
-                                        es_field_def["system_name"],
-                                        es_field_def["start"],
-                                    )
-                                if diff_field_id in es_field_def["end"]:
-                                    await add_entities_and_field_to_update(
-                                        es_entity_type_id,
-                                        diff_field_id,
-                                        es_field_def["system_name"],
-                                        es_field_def["end"],
-                                    )
-                        else:
-                            for diff_field_id in diff_field_ids:
-                                if diff_field_id in es_field_def["selector_value"]:
-                                    await add_entities_and_field_to_update(
-                                        es_entity_type_id,
-                                        diff_field_id,
-                                        es_field_def["system_name"],
-                                        es_field_def["selector_value"],
-                                    )
+        if entities_or_relations == "entities":
+            find_entities_linked = self._data_repo.find_entities_linked_to_entity
+        else:
+            find_entities_linked = self._data_repo.find_entities_linked_to_relation
+        # All paths starting from the same entity type are resolved using a single query
+        for es_entity_type_id, paths in paths_to_update.items():
+            entity_ids_per_path = await find_entities_linked(
+                await self._get_project_id(),
+                es_entity_type_id,
+                type_id,
+                id,
+                [path for (path, _) in paths],
+                connection,
+            )
+            for ((_, es_field_system_name), entity_ids) in zip(
+                paths, entity_ids_per_path
+            ):
+                add_entities_and_field_to_update(
+                    es_entity_type_id, es_field_system_name, entity_ids
+                )
 
         # Add index or delete action for new entities or deleted entities with no content
         if entities_or_relations == "entities":
@@ -1803,11 +1819,95 @@ class DataManager:
                 if old_id not in es_query["delete"][type_id]:
                     es_query["delete"][type_id][old_id] = set()
 
+    @staticmethod
+    def dump_es_query(es_query: typing.Dict) -> typing.Dict:
+        """Convert an es_query to a JSON serializable dict (field system names as sorted lists)."""
+        return {
+            action: {
+                es_entity_type_id: {
+                    e_id: sorted(es_field_system_names)
+                    for e_id, es_field_system_names in entities.items()
+                }
+                for es_entity_type_id, entities in es_query[action].items()
+            }
+            for action in es_query
+        }
+
+    @staticmethod
+    def merge_es_queries(es_queries: typing.List[typing.Dict]) -> typing.Dict:
+        """Merge dumped es_queries (in the order they have been created) into a single es_query.
+
+        The fields to be updated for the same (action, entity type, entity) are combined.
+        Deleted entities are only deleted, entities that are (re)indexed don't need an additional update.
+        """
+        es_query = {"index": {}, "update": {}, "delete": {}}
+        for dumped_es_query in es_queries:
+            for action in dumped_es_query:
+                for es_entity_type_id, entities in dumped_es_query[action].items():
+                    for e_id, es_field_system_names in entities.items():
+                        # JSON object keys are strings
+                        e_id = int(e_id)
+                        for a in es_query:
+                            if es_entity_type_id not in es_query[a]:
+                                es_query[a][es_entity_type_id] = {}
+                        if action == "delete":
+                            es_query["index"][es_entity_type_id].pop(e_id, None)
+                            es_query["update"][es_entity_type_id].pop(e_id, None)
+                            es_query["delete"][es_entity_type_id][e_id] = set()
+                            continue
+                        if e_id in es_query["delete"][es_entity_type_id]:
+                            continue
+                        # Entities with a pending index action don't need an additional update
+                        if (
+                            action == "index"
+                            or e_id in es_query["index"][es_entity_type_id]
+                        ):
+                            target = "index"
+                        else:
+                            target = "update"
+                        fields = es_query["update"][es_entity_type_id].pop(e_id, set())
+                        fields.update(
+                            es_query["index"][es_entity_type_id].get(e_id, set())
+                        )
+                        fields.update(es_field_system_names)
+                        es_query[target][es_entity_type_id][e_id] = fields
+
+        return {
+            action: {
+                es_entity_type_id: entities
+                for es_entity_type_id, entities in es_query[action].items()
+                if entities
+            }
+            for action in es_query
+            if any(es_query[action].values())
+        }
+
+    async def add_es_query_to_outbox(
+        self,
+        es_query: typing.Dict,
+        connection: asyncpg.Connection,
+    ) -> None:
+        """Store an es_query in the outbox, so it is applied by an EsOutboxWorker after the transaction is committed.
+
+        Args:
+            es_query (typing.Dict): Entities (and their fields) to be updated, indexed or deleted.
+            connection (asyncpg.Connection): Connection with the transaction of the data modification.
+        """
+        if not any(any(es_query[action].values()) for action in es_query):
+            return
+        await self._outbox_repo.add(
+            self._project_name,
+            self.__class__.dump_es_query(es_query),
+            connection,
+        )
+
     async def update_es(
         self,
         es_query: typing.Dict,
         connection: asyncpg.Connection,
+        refresh: typing.Union[bool, str] = "wait_for",
     ) -> None:
+        # Changes are visible after the next periodic refresh (read-your-writes for editors, without forcing refreshes)
         entity_types_config = await self._config_manager.get_entity_types_config(
             self._project_name
         )
@@ -1820,23 +1920,19 @@ class DataManager:
                     )
                 )
                 entity_type_config = entity_types_config[entity_type_name]
-                # Batch entities in lists with the same entity type and the same required fields
-                while es_query[action][es_entity_type_id]:
-                    batch_entity_ids = []
-                    [e_id, es_field_system_names] = es_query[action][
-                        es_entity_type_id
-                    ].popitem()
-                    batch_entity_ids = [
-                        i
-                        for i in es_query[action][es_entity_type_id]
-                        if es_query[action][es_entity_type_id][i]
-                        == es_field_system_names
-                    ]
-                    for other_e_id in batch_entity_ids:
-                        del es_query[action][es_entity_type_id][other_e_id]
-
-                    batch_entity_ids.append(e_id)
-
+                # Group entities requiring the same fields in a single pass
+                entity_ids_per_fields = {}
+                for e_id, es_field_system_names in es_query[action][
+                    es_entity_type_id
+                ].items():
+                    entity_ids_per_fields.setdefault(
+                        frozenset(es_field_system_names), []
+                    ).append(e_id)
+
+                for (
+                    es_field_system_names,
+                    entity_ids,
+                ) in entity_ids_per_fields.items():
                     es_data_config = [
                         field_def
                         for field_def in entity_type_config["config"]["es_data"][
@@ -1844,53 +1940,143 @@ class DataManager:
                         ]
                         if field_def["system_name"] in es_field_system_names
                     ]
-                    triplehop_query = (
-                        BaseElasticsearch.extract_query_from_es_data_config(
-                            es_data_config
-                        )
+                    await self._update_es_batches(
+                        action,
+                        es_entity_type_id,
+                        entity_ids,
+                        entity_types_config,
+                        es_data_config,
+                        connection,
+                        refresh,
                     )
 
-                    batch_counter = 0
-                    while True:
-                        batch_ids = batch_entity_ids[
-                            batch_counter
-                            * BATCH_SIZE : (batch_counter + 1)
-                            * BATCH_SIZE
-                        ]
-                        if action == "delete":
-                            batch_entities = {batch_id: None for batch_id in batch_ids}
+    async def _update_es_batches(
+        self,
+        action: str,
+        es_entity_type_id: str,
+        entity_ids: typing.List[int],
+        entity_types_config: typing.Dict,
+        es_data_config: typing.List,
+        connection: asyncpg.Connection,
+        refresh: typing.Union[bool, str],
+    ) -> None:
+        """Update entities requiring the same fields, using the pipeline that is also used for a full reindex."""
+        triplehop_query = BaseElasticsearch.extract_query_from_es_data_config(
+            es_data_config
+        )
 
-                        else:
-                            batch_entities = await self.get_entity_data(
-                                batch_ids,
-                                triplehop_query,
-                                entity_type_id=es_entity_type_id,
-                                connection=connection,
-                            )
+        async def fetch(batch_ids: typing.List[int]) -> typing.Dict:
+            if action == "delete":
+                return {batch_id: None for batch_id in batch_ids}
+            return await self.get_entity_data(
+                batch_ids,
+                triplehop_query,
+                entity_type_id=es_entity_type_id,
+                connection=connection,
+            )
 
-                        batch_docs = BaseElasticsearch.convert_entities_to_docs(
-                            entity_types_config, es_data_config, batch_entities
-                        )
+        async def send(batch_docs: typing.Dict) -> None:
+            await self._es.op_bulk(es_entity_type_id, batch_docs, action, refresh)
 
-                        await self._es.op_bulk(es_entity_type_id, batch_docs, action)
+        pipeline = BulkPipeline(
+            fetch,
+            functools.partial(
+                BaseElasticsearch.convert_entities_to_docs,
+                entity_types_config,
+                es_data_config,
+            ),
+            send,
+            # A single connection can only execute one query at a time
+            fetch_concurrency=1 if connection is not None else FETCH_CONCURRENCY,
+        )
+        await pipeline.run(batched(entity_ids, BATCH_SIZE))
 
-                        if (batch_counter + 1) * BATCH_SIZE + 1 > len(batch_entity_ids):
-                            break
+    async def es_reindex(
+        self,
+        entity_type_name: str,
+        entity_ids: typing.Union[typing.Iterable[int], typing.AsyncIterable[int]],
+        progress: typing.Callable[[int], typing.Awaitable[None]] = None,
+        convert_processes: int = 0,
+        **pipeline_kwargs,
+    ) -> None:
+        """Index all given entities of an entity type in a new index and switch the alias to this new index.
+
+        Fetching, conversion and bulk indexing of batches are overlapped using a BulkPipeline.
+
+        Args:
+            entity_type_name (str): Name of the entity type to be reindexed.
+            entity_ids (typing.Union[typing.Iterable[int], typing.AsyncIterable[int]]): Ids of the entities to be
+                indexed.
+            progress (typing.Callable[[int], typing.Awaitable[None]], optional): Coroutine function called with the
+                number of entities in each batch that has been indexed.
+            convert_processes (int, optional): If larger than 0, convert batches in a pool with this number of
+                worker processes instead of in a thread of the current process.
+            pipeline_kwargs: Additional keyword arguments for the BulkPipeline (concurrency settings).
+        """
+        entity_types_config = await self._get_entity_types_config()
+        entity_type_config = entity_types_config[entity_type_name]
+        es_data_config = entity_type_config["config"]["es_data"]["fields"]
+        triplehop_query = BaseElasticsearch.extract_query_from_es_data_config(
+            es_data_config
+        )
+
+        new_index_name = await self._es.create_new_index(es_data_config)
+
+        async def fetch(batch_ids: typing.List[int]) -> typing.Dict:
+            return await self.get_entity_data(
+                batch_ids,
+                triplehop_query,
+                entity_type_name=entity_type_name,
+            )
+
+        async def send(batch_docs: typing.Dict) -> None:
+            await self._es.add_bulk(new_index_name, batch_docs)
+
+        async with contextlib.AsyncExitStack() as stack:
+            if convert_processes > 0:
+                executor = await stack.enter_async_context(
+                    convert_executor(entity_types_config, convert_processes)
+                )
+                convert = functools.partial(convert_in_worker, es_data_config)
+                # Keep all worker processes busy
+                pipeline_kwargs["convert_concurrency"] = max(
+                    pipeline_kwargs.get("convert_concurrency", CONVERT_CONCURRENCY),
+                    convert_processes,
+                )
+            else:
+                executor = None
+                convert = functools.partial(
+                    BaseElasticsearch.convert_entities_to_docs,
+                    entity_types_config,
+                    es_data_config,
+                )
+
+            pipeline = BulkPipeline(
+                fetch,
+                convert,
+                send,
+                executor=executor,
+                **pipeline_kwargs,
+            )
+            await pipeline.run(batched(entity_ids, BATCH_SIZE), progress)
 
-                        batch_counter += 1
+        await self._es.switch_to_new_index(new_index_name, entity_type_config["id"])
 
     # TODO: merge with es.base.extract_query_from_es_data_config?
-    async def find_entities_to_update(
-        self,
-        es_entity_type_id: str,
+    @staticmethod
+    def get_paths_to_update(
         entities_or_relations: str,
-        type_id: str,
-        id: int,
         selector_value: str,
         diff_field_id: str,
-        connection: asyncpg.Connection,
-    ) -> typing.Set:
-        result = set()
+    ) -> typing.Tuple[bool, typing.List[typing.List[str]]]:
+        """Get the relation paths from the entities using a selector value to a modified entity or relation.
+
+        Returns:
+            typing.Tuple[bool, typing.List[typing.List[str]]]: Whether the modified entity itself uses the modified
+                field and the relation paths (lists of $r_id and $ri_id parts).
+        """
+        self_to_update = False
+        paths = []
         for match in RE_FIELD_CONVERSION.finditer(selector_value):
             if diff_field_id not in match.group(0):
                 continue
@@ -1898,7 +2084,7 @@ class DataManager:
             if entities_or_relations == "entities":
                 # Property of the entity type itself
                 if diff_field_id == match.group(0):
-                    result.add(id)
+                    self_to_update = True
                     continue
 
                 # Property of another entity type
@@ -1906,56 +2092,13 @@ class DataManager:
                 if path[-1] != diff_field_id:
                     raise Exception("Updated field is not last part of query path")
 
-                entity_ids = await self._data_repo.find_entities_linked_to_entity(
-                    await self._get_project_id(),
-                    es_entity_type_id,
-                    type_id,
-                    id,
-                    path[:-1],
-                    connection,
-                )
+                paths.append(path[:-1])
             else:
                 # Property of an entity type
                 path = match.group(0).split(".")
                 if path[1] != diff_field_id:
                     raise Exception("Updated field is not last part of query path")
 
-                path = path[0].split("->")
-
-                entity_ids = await self._data_repo.find_entities_linked_to_relation(
-                    await self._get_project_id(),
-                    es_entity_type_id,
-                    type_id,
-                    id,
-                    path,
-                    connection,
-                )
-
-            if entity_ids:
-                result.update(entity_ids)
-
-        return result
-
-    async def find_entities_to_update_for_relation(
-        self,
-        es_entity_type_id: str,
-        type_id: str,
-        id: int,
-        diff_field_id: str,
-        connection: asyncpg.Connection,
-    ) -> typing.Set:
-        result = set()
-
-        entity_ids = await self._data_repo.find_entities_linked_to_relation(
-            await self._get_project_id(),
-            es_entity_type_id,
-            type_id,
-            id,
-            [diff_field_id],
-            connection,
-        )
-
-        if entity_ids:
-            result.update(entity_ids)
+                paths.append(path[0].split("->"))
 
-        return result
+        return (self_to_update, paths)
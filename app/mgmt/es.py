@@ -1,5 +1,9 @@
+import base64
+import csv
 import datetime
+import io
 import itertools
+import json
 import typing
 
 import aiocache
@@ -11,13 +15,43 @@ import typing_extensions
 
 from app.auth.permission import (has_entity_type_permission,
                                  require_entity_type_permission)
-from app.cache.core import self_project_name_entity_type_name_key_builder
+from app.cache.core import LRUCache, self_project_name_entity_type_name_key_builder
 from app.config import ELASTICSEARCH
-from app.es.base import AGG_SIZE, DEFAULT_FROM, DEFAULT_SIZE, MAX_INT
+from app.es.base import (
+    AGG_SIZE,
+    DEFAULT_FROM,
+    DEFAULT_SIZE,
+    MAX_INT,
+    BaseElasticsearch,
+    get_alias_generation,
+)
 from app.mgmt.config import ConfigManager
 from app.models.auth import UserWithPermissions
 from app.utils import dtu
 
+# Number of seconds full range aggregations are cached
+# Index updates by other processes are only taken into account after this time
+FULL_RANGE_AGGS_TTL = 300
+
+# Full range aggregations, by alias, alias generation and requested aggregations
+_full_range_aggs = LRUCache(256, FULL_RANGE_AGGS_TTL)
+
+# How long a point in time used by a cursor is kept alive between two searches
+PIT_KEEP_ALIVE = "5m"
+
+# Number of results requested at once when exporting
+EXPORT_PAGE_SIZE = 1000
+
+# Number of seconds search results are cached
+# Index updates by other processes are only taken into account after this time
+SEARCH_RESULTS_TTL = 60
+
+# Search results, by alias, config version, alias generation, permissions and search body
+_search_results = LRUCache(1024, SEARCH_RESULTS_TTL)
+
+# Values normalized by Elasticsearch (the normalizer is the same for all indices)
+_normalized_values = LRUCache(4096)
+
 
 class ElasticsearchManager:
     def __init__(
@@ -1207,6 +1241,103 @@ class ElasticsearchManager:
 
         return results
 
+    async def _msearch(
+        self, bodies: typing.List[typing.Dict]
+    ) -> typing.List[typing.Dict]:
+        """Send multiple search requests in a single round trip."""
+        alias_name = await self._get_alias_name()
+        request_body = []
+        for body in bodies:
+            # Searches in a point in time can't specify an index
+            if "pit" in body:
+                request_body.extend([{}, body])
+            else:
+                request_body.extend([{"index": alias_name}, body])
+
+        raw_result = await self._es.msearch(
+            body=request_body,
+        )
+
+        for response in raw_result["responses"]:
+            # Raise the error a single search request would have raised
+            if "error" in response:
+                status = response.get("status", 500)
+                raise elasticsearch.exceptions.HTTP_EXCEPTIONS.get(
+                    status, elasticsearch.exceptions.TransportError
+                )(status, response["error"]["type"], response["error"])
+
+        return raw_result["responses"]
+
+    async def _search_request(self, body: typing.Dict) -> typing.Dict:
+        # Searches in a point in time can't specify an index
+        if "pit" in body:
+            return await self._es.search(body=body)
+        return await self._es.search(
+            index=await self._get_alias_name(),
+            body=body,
+        )
+
+    async def _open_point_in_time(self) -> str:
+        response = await self._es.open_point_in_time(
+            index=await self._get_alias_name(),
+            keep_alive=PIT_KEEP_ALIVE,
+        )
+        return response["id"]
+
+    async def _close_point_in_time(self, pit_id: str) -> None:
+        await self._es.close_point_in_time(body={"id": pit_id})
+
+    @staticmethod
+    def _encode_cursor(cursor: typing.Dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> typing.Dict:
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            decoded = None
+        # Cursors returned by a search (not the empty cursor starting a new point in time)
+        if not (
+            isinstance(decoded, dict)
+            and isinstance(decoded.get("id"), str)
+            and isinstance(decoded.get("search_after"), list)
+            and isinstance(decoded.get("total"), int)
+            and isinstance(decoded.get("from"), int)
+        ):
+            raise fastapi.exceptions.HTTPException(
+                status_code=400,
+                detail="Invalid cursor",
+            )
+        return decoded
+
+    async def _get_search_cache_key(self, body: typing.Dict) -> typing.Tuple:
+        alias_name = await self._get_alias_name()
+        normalized_body = {
+            "filters": {
+                key: value
+                for (key, value) in (body["filters"] or {}).items()
+                if value is not None
+            },
+            "page": body["page"] or 1,
+            "size": body["size"] or DEFAULT_SIZE,
+            "sortBy": body["sortBy"],
+            "sortOrder": body["sortOrder"],
+        }
+        return (
+            alias_name,
+            await self._config_manager.get_config_version(self._project_name),
+            get_alias_generation(alias_name),
+            # Results don't depend on the user, as long as permissions are the same
+            json.dumps(
+                self._user.permissions[self._project_name]["entities"][
+                    self._entity_type_name
+                ]["es_data"],
+                sort_keys=True,
+            ),
+            json.dumps(normalized_body, sort_keys=True),
+        )
+
     async def search(self, body: typing.Dict) -> typing.Dict:
         require_entity_type_permission(
             self._user,
@@ -1215,8 +1346,44 @@ class ElasticsearchManager:
             "es_data",
             "view",
         )
+
+        if body["cursor"] is not None:
+            try:
+                return await self._search(body)
+            except elasticsearch.exceptions.NotFoundError:
+                if body["cursor"] == "":
+                    raise
+                raise fastapi.exceptions.HTTPException(
+                    status_code=404,
+                    detail="Cursor expired",
+                )
+
+        # Results only change when documents or the config are updated
+        cache_key = await self._get_search_cache_key(body)
+        result = _search_results.get(cache_key)
+        if result is None:
+            result = await self._search(body)
+            _search_results.set(cache_key, result)
+        return result
+
+    async def _search(self, body: typing.Dict) -> typing.Dict:
         es_config = await self._get_es_config()
 
+        # Deep pagination using a cursor (point in time and search_after)
+        # An empty cursor starts a new point in time
+        cursor = None
+        if body["cursor"] == "":
+            cursor = {
+                "id": await self._open_point_in_time(),
+                "search_after": None,
+                "total": None,
+                "from": DEFAULT_FROM,
+            }
+        elif body["cursor"] is not None:
+            cursor = self.__class__._decode_cursor(body["cursor"])
+        # Aggregations and total are only calculated on the first page
+        first_page = cursor is None or cursor["search_after"] is None
+
         # Clean filters
         if body["filters"]:
             filters = {
@@ -1229,50 +1396,6 @@ class ElasticsearchManager:
         else:
             filters = None
 
-        # Min and max data ranges
-        full_range_aggs = {}
-        request_full_range_aggs = self.__class__._construct_full_range_aggs(es_config)
-        if request_full_range_aggs:
-            raw_aggs = await self._es.search(
-                index=await self._get_alias_name(),
-                body={
-                    # only aggregation
-                    "size": 0,
-                    "aggs": request_full_range_aggs,
-                },
-            )
-            full_range_aggs = self.__class__._extract_full_range_aggs(raw_aggs)
-
-        # Aggregations
-        request_aggs = self.__class__._construct_aggs(
-            es_config,
-            filters,
-            full_range_aggs=full_range_aggs,
-        )
-        if request_aggs is not None:
-            request_body = {
-                # only aggregation
-                "size": 0,
-                "aggs": request_aggs,
-            }
-
-            request_query = self.__class__._construct_query(
-                es_config,
-                filters,
-                global_aggs=True,
-            )
-            if request_query is not None:
-                request_body["query"] = request_query
-
-            raw_aggs = await self._es.search(
-                index=await self._get_alias_name(),
-                body=request_body,
-            )
-
-            aggs = self._extract_aggs(es_config, raw_aggs, filters, full_range_aggs)
-        else:
-            aggs = {}
-
         # Data
         request_body = {
             "_source": False,
@@ -1284,10 +1407,12 @@ class ElasticsearchManager:
         else:
             request_body["size"] = DEFAULT_SIZE
 
-        if body["page"]:
-            request_body["from"] = (body["page"] - 1) * request_body["size"]
+        if cursor is not None:
+            offset = cursor["from"]
+        elif body["page"]:
+            offset = (body["page"] - 1) * request_body["size"]
         else:
-            request_body["from"] = DEFAULT_FROM
+            offset = DEFAULT_FROM
 
         sorting = self._get_sorting(
             es_config,
@@ -1300,29 +1425,266 @@ class ElasticsearchManager:
             sorting["sort_order"],
         )
 
+        if cursor is None:
+            request_body["from"] = offset
+        else:
+            request_body["pit"] = {
+                "id": cursor["id"],
+                "keep_alive": PIT_KEEP_ALIVE,
+            }
+            # Tiebreaker, so documents with equal sort values are never skipped or repeated between pages.
+            # _shard_doc (shard and document index within the point in time) is unique and cheap to sort on;
+            # sorting on _id would require loading the _id field data in memory.
+            request_body["sort"].append({"_shard_doc": "asc"})
+            if cursor["search_after"] is not None:
+                request_body["search_after"] = cursor["search_after"]
+            if not first_page:
+                request_body["track_total_hits"] = False
+
         request_body["fields"] = self._construct_fields(es_config)
 
         request_query = self._construct_query(es_config, filters)
         if request_query is not None:
             request_body["query"] = request_query
 
-        raw_result = await self._es.search(
-            index=await self._get_alias_name(),
-            body=request_body,
-        )
+        # Only the aggregations depend on the min and max data ranges:
+        # the data is requested together with the first request that is sent.
+        raw_result = None
+        aggs = None
+
+        if first_page:
+            # Min and max data ranges
+            # These only change when documents are updated
+            full_range_aggs = {}
+            request_full_range_aggs = self.__class__._construct_full_range_aggs(
+                es_config
+            )
+            if request_full_range_aggs:
+                alias_name = await self._get_alias_name()
+                full_range_aggs_key = (
+                    alias_name,
+                    get_alias_generation(alias_name),
+                    json.dumps(request_full_range_aggs, sort_keys=True),
+                )
+                full_range_aggs = _full_range_aggs.get(full_range_aggs_key)
+                if full_range_aggs is None:
+                    (raw_aggs, raw_result) = await self._msearch(
+                        [
+                            {
+                                # only aggregation
+                                "size": 0,
+                                "aggs": request_full_range_aggs,
+                            },
+                            request_body,
+                        ]
+                    )
+                    full_range_aggs = self.__class__._extract_full_range_aggs(raw_aggs)
+                    _full_range_aggs.set(full_range_aggs_key, full_range_aggs)
+
+            # Aggregations
+            request_aggs = self.__class__._construct_aggs(
+                es_config,
+                filters,
+                full_range_aggs=full_range_aggs,
+            )
+            if request_aggs is not None:
+                aggs_request_body = {
+                    # only aggregation
+                    "size": 0,
+                    "aggs": request_aggs,
+                }
+
+                aggs_request_query = self.__class__._construct_query(
+                    es_config,
+                    filters,
+                    global_aggs=True,
+                )
+                if aggs_request_query is not None:
+                    aggs_request_body["query"] = aggs_request_query
+
+                if raw_result is None:
+                    (raw_aggs, raw_result) = await self._msearch(
+                        [aggs_request_body, request_body]
+                    )
+                else:
+                    raw_aggs = await self._es.search(
+                        index=await self._get_alias_name(),
+                        body=aggs_request_body,
+                    )
+
+                aggs = self._extract_aggs(es_config, raw_aggs, filters, full_range_aggs)
+            else:
+                aggs = {}
+
+        if raw_result is None:
+            raw_result = await self._search_request(request_body)
         results = self._extract_results(es_config, raw_result, sorting)
 
+        if first_page:
+            total = raw_result["hits"]["total"]["value"]
+        else:
+            total = cursor["total"]
+
         result = {
             "sortBy": sorting["sort_by"],
             "sortOrder": sorting["sort_order"],
-            "total": raw_result["hits"]["total"]["value"],
+            "total": total,
             "aggs": aggs,
             "results": results,
-            "from": request_body["from"] + 1,
-            "to": request_body["from"] + len(results),
+            "from": offset + 1,
+            "to": offset + len(results),
         }
+
+        if cursor is not None:
+            hits = raw_result["hits"]["hits"]
+            # The point in time id can change between searches
+            pit_id = raw_result.get("pit_id", cursor["id"])
+            if hits and offset + len(hits) < total:
+                result["cursor"] = self.__class__._encode_cursor(
+                    {
+                        "id": pit_id,
+                        "search_after": hits[-1]["sort"],
+                        "total": total,
+                        "from": offset + len(hits),
+                    }
+                )
+            else:
+                await self._close_point_in_time(pit_id)
+                result["cursor"] = None
+
         return result
 
+    @staticmethod
+    def _get_export_value(value: typing.Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return " | ".join(
+                [ElasticsearchManager._get_export_value(v) for v in value]
+            )
+        if isinstance(value, dict):
+            # nested values
+            if "value" in value:
+                return ElasticsearchManager._get_export_value(value["value"])
+            # uncertain centuries
+            if "display" in value:
+                return ElasticsearchManager._get_export_value(value["display"])
+            return json.dumps(value)
+        return str(value)
+
+    @staticmethod
+    def _format_export_rows(
+        columns: typing.List[str],
+        rows: typing.List[typing.Dict],
+        format: typing_extensions.Literal["ndjson", "csv"],
+        header: bool = False,
+    ) -> str:
+        if format == "ndjson":
+            return "".join([f"{json.dumps(row)}\n" for row in rows])
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        if header:
+            writer.writerow(columns)
+        for row in rows:
+            writer.writerow(
+                [
+                    ElasticsearchManager._get_export_value(row.get(column))
+                    for column in columns
+                ]
+            )
+        return output.getvalue()
+
+    async def _export(
+        self,
+        es_config: typing.Dict,
+        request_body: typing.Dict,
+        sorting: typing.Dict[str, str],
+        format: typing_extensions.Literal["ndjson", "csv"],
+    ) -> typing.AsyncIterator[str]:
+        columns = ["_id", *es_config["columns"].keys()]
+        pit_id = await self._open_point_in_time()
+        try:
+            header = True
+            while True:
+                request_body["pit"] = {
+                    "id": pit_id,
+                    "keep_alive": PIT_KEEP_ALIVE,
+                }
+                raw_result = await self._search_request(request_body)
+                # The point in time id can change between searches
+                pit_id = raw_result.get("pit_id", pit_id)
+
+                hits = raw_result["hits"]["hits"]
+                rows = self._extract_results(es_config, raw_result, sorting)
+                if rows or header:
+                    yield self.__class__._format_export_rows(
+                        columns, rows, format, header
+                    )
+                header = False
+
+                if len(hits) < request_body["size"]:
+                    break
+                request_body["search_after"] = hits[-1]["sort"]
+        finally:
+            await self._close_point_in_time(pit_id)
+
+    async def export(
+        self,
+        body: typing.Dict,
+        format: typing_extensions.Literal["ndjson", "csv"] = "ndjson",
+    ) -> typing.AsyncIterator[str]:
+        """Get all results of a search, one page at a time (see the search method for the cursor variant)."""
+        # Check permissions before anything is streamed
+        require_entity_type_permission(
+            self._user,
+            self._project_name,
+            self._entity_type_name,
+            "es_data",
+            "view",
+        )
+        es_config = await self._get_es_config()
+
+        # Clean filters
+        if body["filters"]:
+            filters = {
+                key: value
+                for (key, value) in body["filters"].items()
+                if value is not None
+            }
+            if not len(filters):
+                filters = None
+        else:
+            filters = None
+
+        sorting = self._get_sorting(
+            es_config,
+            body["sortBy"],
+            body["sortOrder"],
+        )
+
+        request_body = {
+            "_source": False,
+            "track_total_hits": False,
+            "size": EXPORT_PAGE_SIZE,
+            # See _search for the tiebreaker
+            "sort": [
+                *self._construct_sort(
+                    es_config,
+                    sorting["sort_by"],
+                    sorting["sort_order"],
+                ),
+                {"_shard_doc": "asc"},
+            ],
+            "fields": self._construct_fields(es_config),
+        }
+
+        request_query = self._construct_query(es_config, filters)
+        if request_query is not None:
+            request_body["query"] = request_query
+
+        return self._export(es_config, request_body, sorting, format)
+
     async def suggest(self, body: typing.Dict) -> typing.Dict:
         es_config = await self._get_es_config()
 
@@ -1355,6 +1717,14 @@ class ElasticsearchManager:
         ]
 
     async def get_normalized_value(self, value: str) -> str:
+        normalized = BaseElasticsearch.normalize(value)
+        if normalized is not None:
+            return normalized
+
+        normalized = _normalized_values.get(value)
+        if normalized is not None:
+            return normalized
+
         indices_client = elasticsearch.client.IndicesClient(self._es)
         normalized = await indices_client.analyze(
             index=await self._get_alias_name(),
@@ -1363,7 +1733,9 @@ class ElasticsearchManager:
                 "text": value,
             },
         )
-        return normalized["tokens"][0]["token"]
+        normalized = normalized["tokens"][0]["token"]
+        _normalized_values.set(value, normalized)
+        return normalized
 
     async def aggregation_suggest(self, body: typing.Dict) -> typing.Dict:
         es_config = await self._get_es_config()
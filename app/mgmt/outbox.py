@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import typing
+import uuid
+
+import asyncpg
+import elasticsearch
+import fastapi
+from starlette.requests import Request
+
+from app.config import DATABASE
+from app.db.outbox import ES_OUTBOX_CHANNEL, EsOutboxRepository
+from app.mgmt.data import DataManager
+from app.models.auth import UserWithPermissions
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of outbox rows applied in a single transaction
+OUTBOX_BATCH_SIZE = 100
+# Number of seconds to wait for notifications before checking the outbox anyway
+OUTBOX_POLL_INTERVAL = 5
+# Number of seconds to wait after a notification, so bursts of modifications are applied together
+OUTBOX_COALESCE_WINDOW = 0.2
+# Number of failed attempts after which a row is moved to the dead-letter state (and no longer retried)
+OUTBOX_MAX_ATTEMPTS = 10
+# Number of seconds before the first retry of a failed row (doubled after each failed attempt)
+OUTBOX_RETRY_DELAY = 5
+# Status codes indicating Elasticsearch is (temporarily) unavailable
+ES_UNAVAILABLE_STATUS_CODES = (429, 502, 503, 504)
+
+
+def _es_unavailable(e: Exception) -> bool:
+    # ConnectionError includes ConnectionTimeout
+    if isinstance(e, elasticsearch.ConnectionError):
+        return True
+    return (
+        isinstance(e, elasticsearch.TransportError)
+        and e.status_code in ES_UNAVAILABLE_STATUS_CODES
+    )
+
+
+class EsOutboxWorker:
+    """Apply the Elasticsearch updates stored in the outbox (app.es_outbox) in the background.
+
+    Pending updates are merged, so multiple modifications of the same entity result in a single reindex.
+    The outbox of a project is processed by a single worker at a time (using a Postgres advisory lock), so updates of
+    the same entity are never applied out of order. Multiple application workers can process different projects.
+    Rows are only removed when the corresponding updates have been applied successfully.
+    Failing rows are retried with an exponential backoff and moved to a dead-letter state after OUTBOX_MAX_ATTEMPTS.
+    Attempts failing because Elasticsearch is unavailable are not counted, these rows are retried after
+    OUTBOX_POLL_INTERVAL.
+    The outbox table is created by migrations/es_outbox.sql.
+    """
+
+    def __init__(self, app: fastapi.FastAPI) -> None:
+        self._app = app
+        self._outbox_repo = EsOutboxRepository(app.state.pool)
+        self._user = UserWithPermissions(
+            id=uuid.uuid4(),
+            username="es_outbox",
+            permissions={},
+        )
+        self._event = asyncio.Event()
+        self._connection: typing.Optional[asyncpg.Connection] = None
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def _on_notification(self, _connection, _pid, _channel, _payload: str) -> None:
+        self._event.set()
+
+    async def _listen(self) -> None:
+        self._connection = await asyncpg.connect(**DATABASE)
+        await self._connection.add_listener(ES_OUTBOX_CHANNEL, self._on_notification)
+
+    def _get_data_manager(self, project_name: str) -> DataManager:
+        request = Request(
+            {
+                "type": "http",
+                "app": self._app,
+                "path_params": {
+                    "project_name": project_name,
+                },
+            }
+        )
+        return DataManager(request, self._user)
+
+    async def _apply(
+        self,
+        data_manager: DataManager,
+        rows: typing.List[typing.Dict],
+        connection: asyncpg.Connection,
+    ) -> None:
+        # Use a savepoint, so a failure only discards the work for these rows
+        async with connection.transaction():
+            # Nobody is waiting for these updates, rely on the periodic refresh
+            await data_manager.update_es(
+                DataManager.merge_es_queries([row["es_query"] for row in rows]),
+                connection,
+                refresh=False,
+            )
+            await self._outbox_repo.delete([row["id"] for row in rows], connection)
+
+    async def _process_project(self, project_name: str) -> bool:
+        """Apply the pending rows of a project in a single transaction.
+
+        If the merged updates fail, the rows are applied one by one, so a failing row does not block the others.
+
+        Returns:
+            bool: Whether more rows might be pending for this project.
+        """
+        data_manager = self._get_data_manager(project_name)
+        async with self._app.state.pool.acquire() as connection:
+            async with connection.transaction():
+                if not await self._outbox_repo.try_lock_project(
+                    project_name, connection
+                ):
+                    # Being processed by another worker
+                    return False
+                rows = await self._outbox_repo.claim(
+                    project_name, OUTBOX_BATCH_SIZE, connection
+                )
+                if not rows:
+                    return False
+                try:
+                    await self._apply(data_manager, rows, connection)
+                except Exception as e:
+                    if _es_unavailable(e):
+                        # Retry later on without counting an attempt
+                        logger.warning("Elasticsearch unavailable: %r", e)
+                        return False
+                    for row in rows:
+                        try:
+                            await self._apply(data_manager, [row], connection)
+                        except Exception as e:
+                            if _es_unavailable(e):
+                                logger.warning("Elasticsearch unavailable: %r", e)
+                                return False
+                            logger.exception(
+                                "Elasticsearch outbox row %s of project %s failed",
+                                row["id"],
+                                project_name,
+                            )
+                            dead_lettered = await self._outbox_repo.add_failure(
+                                row["id"],
+                                repr(e),
+                                OUTBOX_MAX_ATTEMPTS,
+                                OUTBOX_RETRY_DELAY,
+                                connection,
+                            )
+                            if dead_lettered:
+                                logger.error(
+                                    "Elasticsearch outbox row %s of project %s moved to the dead-letter state",
+                                    row["id"],
+                                    project_name,
+                                )
+        return len(rows) == OUTBOX_BATCH_SIZE
+
+    async def _process(self) -> bool:
+        """Apply the pending rows of all projects, committing per project.
+
+        Returns:
+            bool: Whether more rows might be pending.
+        """
+        more = False
+        for project_name in await self._outbox_repo.get_pending_project_names():
+            try:
+                more = await self._process_project(project_name) or more
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Don't let a failing project block the others, its rows are retried later on
+                logger.exception(
+                    "Elasticsearch outbox processing of project %s failed",
+                    project_name,
+                )
+        return more
+
+    async def _run(self) -> None:
+        while True:
+            self._event.clear()
+            try:
+                # Reconnect if the listening connection has been lost
+                if self._connection is None or self._connection.is_closed():
+                    await self._listen()
+                if await self._process():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Elasticsearch outbox processing failed")
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+                continue
+
+            try:
+                await asyncio.wait_for(self._event.wait(), OUTBOX_POLL_INTERVAL)
+                await asyncio.sleep(OUTBOX_COALESCE_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+
+
+async def outbox_connect(app: fastapi.FastAPI) -> None:
+    app.state.outbox_worker = EsOutboxWorker(app)
+    await app.state.outbox_worker.start()
+
+
+async def outbox_disconnect(app: fastapi.FastAPI) -> None:
+    await app.state.outbox_worker.stop()
@@ -55,177 +55,133 @@ class RevisionManager:
     }
     """
 
-    async def post_revision(
+    async def _get_type_ids(
         self,
         data: typing.Dict,
         connection: asyncpg.connection.Connection,
-    ):
-        project_id = await self._get_project_id()
-        raw_entities = []
-        raw_relations = []
-        raw_source_relations = []
+    ) -> typing.Tuple[
+        typing.Dict[str, typing.Tuple[str, str]],
+        typing.Dict[str, typing.Tuple[str, str]],
+    ]:
+        """Get the current revision id and id of all entity and relation types used in a revision.
+
+        Returns:
+            typing.Tuple[typing.Dict[str, typing.Tuple[str, str]], typing.Dict[str, typing.Tuple[str, str]]]:
+                (revision id, id) by entity type name and by relation type name.
+        """
+        entity_type_names = set(data.get("entities", {}))
+        relation_type_names = set(data.get("relations", {}))
+        for relation_type_name, relations in data.get("relations", {}).items():
+            for [
+                start_type,
+                _,
+                _,
+                start_type_name,
+                _,
+                end_type_name,
+                _,
+            ] in relations.values():
+                if relation_type_name == "_source_" and start_type != "entity":
+                    relation_type_names.add(start_type_name)
+                else:
+                    entity_type_names.add(start_type_name)
+                entity_type_names.add(end_type_name)
 
-        if "entities" in data:
-            for entity_type_name in data["entities"]:
-                entity_type_revision_id = await self._config_manager.get_current_entity_type_revision_id_by_name(
+        entity_type_ids = {}
+        for entity_type_name in entity_type_names:
+            entity_type_ids[entity_type_name] = (
+                await self._config_manager.get_current_entity_type_revision_id_by_name(
                     self._project_name,
                     entity_type_name,
                     connection=connection,
-                )
-                entity_type_id = await self._config_manager.get_entity_type_id_by_name(
+                ),
+                await self._config_manager.get_entity_type_id_by_name(
                     self._project_name,
                     entity_type_name,
                     connection=connection,
-                )
-                for entity_id, [old_value, new_value] in data["entities"][
-                    entity_type_name
-                ].items():
-                    raw_entities.append(
-                        [
-                            entity_type_revision_id,
-                            entity_type_id,
-                            entity_id,
-                            old_value,
-                            new_value,
-                        ]
-                    )
-
-        if "relations" in data:
-            for relation_type_name in data["relations"]:
-                relation_type_revision_id = await self._config_manager.get_current_relation_type_revision_id_by_name(
+                ),
+            )
+        relation_type_ids = {}
+        for relation_type_name in relation_type_names:
+            relation_type_ids[relation_type_name] = (
+                await self._config_manager.get_current_relation_type_revision_id_by_name(
                     self._project_name,
                     relation_type_name,
                     connection=connection,
-                )
-                relation_type_id = (
-                    await self._config_manager.get_relation_type_id_by_name(
-                        self._project_name,
-                        relation_type_name,
-                        transform_source=True,
-                        connection=connection,
+                ),
+                await self._config_manager.get_relation_type_id_by_name(
+                    self._project_name,
+                    relation_type_name,
+                    transform_source=True,
+                    connection=connection,
+                ),
+            )
+
+        return (entity_type_ids, relation_type_ids)
+
+    async def post_revision(
+        self,
+        data: typing.Dict,
+        connection: asyncpg.connection.Connection,
+    ):
+        project_id = await self._get_project_id()
+        entity_type_ids, relation_type_ids = await self._get_type_ids(data, connection)
+        # Records without revision id and user id, in the order of the revision table columns
+        raw_entities = []
+        raw_relations = []
+        raw_source_relations = []
+
+        for entity_type_name, entities in data.get("entities", {}).items():
+            for entity_id, [old_value, new_value] in entities.items():
+                raw_entities.append(
+                    (
+                        *entity_type_ids[entity_type_name],
+                        entity_id,
+                        json.dumps(old_value),
+                        json.dumps(new_value),
                     )
                 )
 
-                if relation_type_name == "_source_":
-                    for source_relation_id, [
-                        start_type,
-                        old_source_relation_props,
-                        new_source_relation_props,
-                        start_type_name,
-                        start_id,
-                        end_entity_type_name,
-                        end_entity_id,
-                    ] in data["relations"][relation_type_name].items():
-                        if start_type == "entity":
-                            raw_relations.append(
-                                [
-                                    relation_type_revision_id,
-                                    relation_type_id,
-                                    relation_id,
-                                    await self._config_manager.get_current_entity_type_revision_id_by_name(
-                                        self._project_name,
-                                        start_type_name,
-                                        connection=connection,
-                                    ),
-                                    await self._config_manager.get_entity_type_id_by_name(
-                                        self._project_name,
-                                        start_type_name,
-                                        connection=connection,
-                                    ),
-                                    start_id,
-                                    await self._config_manager.get_current_entity_type_revision_id_by_name(
-                                        self._project_name,
-                                        end_entity_type_name,
-                                        connection=connection,
-                                    ),
-                                    await self._config_manager.get_entity_type_id_by_name(
-                                        self._project_name,
-                                        end_entity_type_name,
-                                        connection=connection,
-                                    ),
-                                    end_entity_id,
-                                    old_relation_props,
-                                    new_relation_props,
-                                ]
-                            )
-                        else:
-                            raw_source_relations.append(
-                                [
-                                    relation_type_revision_id,
-                                    relation_type_id,
-                                    source_relation_id,
-                                    await self._config_manager.get_current_relation_type_revision_id_by_name(
-                                        self._project_name,
-                                        start_type_name,
-                                        connection=connection,
-                                    ),
-                                    await self._config_manager.get_relation_type_id_by_name(
-                                        self._project_name,
-                                        start_type_name,
-                                        transform_source=True,
-                                        connection=connection,
-                                    ),
-                                    start_id,
-                                    await self._config_manager.get_current_entity_type_revision_id_by_name(
-                                        self._project_name,
-                                        end_entity_type_name,
-                                        connection=connection,
-                                    ),
-                                    await self._config_manager.get_entity_type_id_by_name(
-                                        self._project_name,
-                                        end_entity_type_name,
-                                        connection=connection,
-                                    ),
-                                    end_entity_id,
-                                    old_source_relation_props,
-                                    new_source_relation_props,
-                                ]
-                            )
-                else:
-                    for relation_id, [
-                        start_type,
-                        old_relation_props,
-                        new_relation_props,
-                        start_entity_type_name,
-                        start_entity_id,
-                        end_entity_type_name,
-                        end_entity_id,
-                    ] in data["relations"][relation_type_name].items():
-                        if start_type != "entity":
-                            raise Exception(
-                                "Not source relations should allways start from an entity"
-                            )
-                        raw_relations.append(
-                            [
-                                relation_type_revision_id,
-                                relation_type_id,
-                                relation_id,
-                                await self._config_manager.get_current_entity_type_revision_id_by_name(
-                                    self._project_name,
-                                    start_entity_type_name,
-                                    connection=connection,
-                                ),
-                                await self._config_manager.get_entity_type_id_by_name(
-                                    self._project_name,
-                                    start_entity_type_name,
-                                    connection=connection,
-                                ),
-                                start_entity_id,
-                                await self._config_manager.get_current_entity_type_revision_id_by_name(
-                                    self._project_name,
-                                    end_entity_type_name,
-                                    connection=connection,
-                                ),
-                                await self._config_manager.get_entity_type_id_by_name(
-                                    self._project_name,
-                                    end_entity_type_name,
-                                    connection=connection,
-                                ),
-                                end_entity_id,
-                                old_relation_props,
-                                new_relation_props,
-                            ]
+        for relation_type_name, relations in data.get("relations", {}).items():
+            for relation_id, [
+                start_type,
+                old_relation_props,
+                new_relation_props,
+                start_type_name,
+                start_id,
+                end_entity_type_name,
+                end_entity_id,
+            ] in relations.items():
+                if start_type == "entity":
+                    raw_relations.append(
+                        (
+                            *relation_type_ids[relation_type_name],
+                            relation_id,
+                            *entity_type_ids[start_type_name],
+                            start_id,
+                            *entity_type_ids[end_entity_type_name],
+                            end_entity_id,
+                            json.dumps(old_relation_props),
+                            json.dumps(new_relation_props),
                         )
+                    )
+                elif relation_type_name == "_source_":
+                    raw_source_relations.append(
+                        (
+                            *relation_type_ids[relation_type_name],
+                            relation_id,
+                            *relation_type_ids[start_type_name],
+                            start_id,
+                            *entity_type_ids[end_entity_type_name],
+                            end_entity_id,
+                            json.dumps(old_relation_props),
+                            json.dumps(new_relation_props),
+                        )
+                    )
+                else:
+                    raise Exception(
+                        "Not source relations should allways start from an entity"
+                    )
 
         # Connection is required
         # There should already be a transaction on the connection, a nested one is created here
@@ -234,19 +190,12 @@ class RevisionManager:
                 project_id,
                 connection,
             )
+            user_id = str(self._user.id)
             if raw_entities:
                 await self._revision_repo.post_entities_revision(
                     project_id,
                     [
-                        {
-                            "revision_id": revision_id,
-                            "user_id": str(self._user.id),
-                            "entity_type_revision_id": raw_entity[0],
-                            "entity_type_id": raw_entity[1],
-                            "entity_id": raw_entity[2],
-                            "old_value": json.dumps(raw_entity[3]),
-                            "new_value": json.dumps(raw_entity[4]),
-                        }
+                        (revision_id, user_id, *raw_entity)
                         for raw_entity in raw_entities
                     ],
                     connection,
@@ -255,21 +204,7 @@ class RevisionManager:
                 await self._revision_repo.post_relations_revision(
                     project_id,
                     [
-                        {
-                            "revision_id": revision_id,
-                            "user_id": str(self._user.id),
-                            "relation_type_revision_id": raw_relation[0],
-                            "relation_type_id": raw_relation[1],
-                            "relation_id": raw_relation[2],
-                            "start_entity_type_revision_id": raw_relation[3],
-                            "start_entity_type_id": raw_relation[4],
-                            "start_entity_id": raw_relation[5],
-                            "end_entity_type_revision_id": raw_relation[6],
-                            "end_entity_type_id": raw_relation[7],
-                            "end_entity_id": raw_relation[8],
-                            "old_value": json.dumps(raw_relation[9]),
-                            "new_value": json.dumps(raw_relation[10]),
-                        }
+                        (revision_id, user_id, *raw_relation)
                         for raw_relation in raw_relations
                     ],
                     connection,
@@ -278,21 +213,7 @@ class RevisionManager:
                 await self._revision_repo.post_relation_sources_revision(
                     project_id,
                     [
-                        {
-                            "revision_id": revision_id,
-                            "user_id": str(self._user.id),
-                            "source_relation_type_revision_id": raw_source_relation[0],
-                            "source_relation_type_id": raw_source_relation[1],
-                            "source_relation_id": raw_source_relation[2],
-                            "start_relation_type_revision_id": raw_source_relation[3],
-                            "start_relation_type_id": raw_source_relation[4],
-                            "start_relation_id": raw_source_relation[5],
-                            "end_entity_type_revision_id": raw_source_relation[6],
-                            "end_entity_type_id": raw_source_relation[7],
-                            "end_entity_id": raw_source_relation[8],
-                            "old_value": json.dumps(raw_source_relation[9]),
-                            "new_value": json.dumps(raw_source_relation[10]),
-                        }
+                        (revision_id, user_id, *raw_source_relation)
                         for raw_source_relation in raw_source_relations
                     ],
                     connection,
@@ -15,6 +15,9 @@ class ElasticSearchBody(pydantic.BaseModel):
     # TODO: add custom validator based on entity type config?
     sortBy: str = None
     sortOrder: typing_extensions.Literal["asc", "desc"] = None
+    # Opaque cursor for deep pagination: use an empty string to request the first page.
+    # Pass the returned cursor (with the same filters and sorting) to request the next page.
+    cursor: str = None
 
     @pydantic.root_validator()
     def check_result_window(cls, values):
@@ -23,7 +26,10 @@ class ElasticSearchBody(pydantic.BaseModel):
         else:
             es_size = DEFAULT_SIZE
 
-        if values["page"]:
+        # Pages requested with a cursor don't use from
+        if values.get("cursor") is not None:
+            es_from = DEFAULT_FROM
+        elif values["page"]:
             es_from = (values["page"] - 1) * es_size
         else:
             es_from = DEFAULT_FROM
@@ -36,6 +42,15 @@ class ElasticSearchBody(pydantic.BaseModel):
         return values
 
 
+class ElasticExportBody(pydantic.BaseModel):
+    # TODO: add custom validator based on entity type config?
+    # https://pydantic-docs.helpmanual.io/usage/validators/
+    filters: typing.Dict = None
+    # TODO: add custom validator based on entity type config?
+    sortBy: str = None
+    sortOrder: typing_extensions.Literal["asc", "desc"] = None
+
+
 class ElasticSuggestBody(pydantic.BaseModel):
     # TODO: add custom validator based on entity type config?
     field: str
@@ -1,7 +1,6 @@
 from app.graphql.config.v1 import GraphQLConfigBuilder
 from app.mgmt.auth import get_current_active_user_with_permissions
 from app.models.auth import UserWithPermissions
-from ariadne.asgi import GraphQL
 from ariadne.constants import PLAYGROUND_HTML
 from fastapi import APIRouter, Depends
 from starlette.requests import Request
@@ -23,5 +22,5 @@ async def handle_graphql_request(
     user: UserWithPermissions = Depends(get_current_active_user_with_permissions),
 ) -> JSONResponse:
     graphql_builder = GraphQLConfigBuilder(request, user)
-    graphql = GraphQL(await graphql_builder.create_schema())
+    graphql = await graphql_builder.get_graphql_handler()
     return await graphql.graphql_http_server(request)
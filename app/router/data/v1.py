@@ -1,7 +1,6 @@
 from app.graphql.data.v1 import GraphQLDataBuilder
 from app.mgmt.auth import get_current_active_user_with_permissions
 from app.models.auth import UserWithPermissions
-from ariadne.asgi import GraphQL
 from ariadne.constants import PLAYGROUND_HTML
 from fastapi import APIRouter, Depends
 from starlette.requests import Request
@@ -22,6 +21,8 @@ async def handle_graphql_request(
     request: Request,
     user: UserWithPermissions = Depends(get_current_active_user_with_permissions),
 ) -> JSONResponse:
+    # Used in the GraphQL context
+    request.state.user = user
     graphql_builder = GraphQLDataBuilder(request, user)
-    graphql = GraphQL(await graphql_builder.create_schema())
+    graphql = await graphql_builder.get_graphql_handler()
     return await graphql.graphql_http_server(request)
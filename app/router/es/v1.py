@@ -1,5 +1,7 @@
+import typing_extensions
 from fastapi import APIRouter, BackgroundTasks, Depends
 from starlette.requests import Request
+from starlette.responses import StreamingResponse
 
 from app.auth.permission import require_entity_type_permission
 from app.mgmt.auth import get_current_active_user_with_permissions
@@ -8,6 +10,7 @@ from app.mgmt.job import JobManager
 from app.models.auth import UserWithPermissions
 from app.models.es import (
     ElasticAggregationSuggestBody,
+    ElasticExportBody,
     ElasticSearchBody,
     ElasticSuggestBody,
 )
@@ -30,6 +33,27 @@ async def search(
     return await elasticsearch_manager.search(body.dict())
 
 
+@router.post("/{project_name}/{entity_type_name}/export")
+async def export(
+    project_name: str,
+    entity_type_name: str,
+    body: ElasticExportBody,
+    request: Request,
+    format: typing_extensions.Literal["ndjson", "csv"] = "ndjson",
+    user: UserWithPermissions = Depends(get_current_active_user_with_permissions),
+):
+    elasticsearch_manager = ElasticsearchManager(
+        project_name, entity_type_name, request, user
+    )
+    return StreamingResponse(
+        await elasticsearch_manager.export(body.dict(), format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{entity_type_name}.{format}"'
+        },
+    )
+
+
 @router.post("/{project_name}/{entity_type_name}/suggest")
 async def suggest(
     project_name: str,
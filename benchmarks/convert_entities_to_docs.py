@@ -0,0 +1,221 @@
+"""Measure the throughput (docs/s) of BaseElasticsearch.convert_entities_to_docs on synthetic entities.
+
+The entities are generated with a fixed seed: an entity type with up to 6 relations per entity to another entity type
+and 12 fields covering the field types (concatenations, relation paths, relation properties, flattened and nested
+fields, EDTF values and display_not_available).
+
+Optionally, the implementation of app/es/base.py at another git revision is measured as baseline, after verifying both
+implementations create identical documents. E.g., to compare with the implementation before selector values were
+compiled (SelectorTemplate):
+    python -m benchmarks.convert_entities_to_docs \
+        --baseline "$(git log --format=%H -S 'class SelectorTemplate' -- app/es/base.py | tail -1)~1"
+
+Use --years-only to only generate plain years as EDTF values (which don't need to be parsed by edtf).
+"""
+import random
+import subprocess
+import time
+import types
+import typing
+import uuid
+
+import typer
+
+from app.es.base import BaseElasticsearch
+from app.utils import dtu
+
+EDTF_VALUES = ["1920", "1920-01-05", "192X", "1920/1930"]
+YEAR_VALUES = ["1920", "1921", "1930"]
+
+
+def load_baseline(revision: str) -> typing.Type:
+    """Load the BaseElasticsearch class from app/es/base.py at a git revision."""
+    source = subprocess.run(
+        ["git", "show", f"{revision}:app/es/base.py"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    module = types.ModuleType("baseline_base")
+    exec(compile(source, f"{revision}:app/es/base.py", "exec"), module.__dict__)
+    return module.BaseElasticsearch
+
+
+def synthetic_entities(
+    nr_of_entities: int,
+    years_only: bool,
+) -> typing.Tuple[typing.Dict, typing.List, typing.Dict]:
+    """Create a synthetic config and entities.
+
+    Returns:
+        typing.Tuple[typing.Dict, typing.List, typing.Dict]: The entity types config, the es_data config and the
+            entities.
+    """
+    rnd = random.Random(1)
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+    (a_id, b_id, r_id, rp_id) = (new_id(), new_id(), new_id(), new_id())
+    pa = [new_id() for _ in range(4)]
+    pb = [new_id() for _ in range(3)]
+    entity_types_config = {
+        "a": {"id": a_id, "display_name": "A"},
+        "b": {"id": b_id, "display_name": "B"},
+    }
+    es_data_config = [
+        {"system_name": "f1", "type": "text", "selector_value": f"${pa[0]}"},
+        {
+            "system_name": "f2",
+            "type": "text",
+            "selector_value": f"${pa[0]} $||$ ${pa[1]}",
+        },
+        {
+            "system_name": "f3",
+            "type": "text",
+            "selector_value": f"[$id] ${pa[0]} ($r_{r_id}->${pb[0]})",
+        },
+        {
+            "system_name": "f4",
+            "type": "[text]",
+            "selector_value": f"$r_{r_id}->${pb[0]}, $r_{r_id}->${pb[1]}",
+        },
+        {
+            "system_name": "f5",
+            "type": "[text]",
+            "selector_value": f"$r_{r_id}.${rp_id}",
+        },
+        {
+            "system_name": "f6",
+            "type": "text_flatten",
+            "selector_value": f"$r_{r_id}->${pb[0]}",
+        },
+        {"system_name": "f7", "type": "integer", "selector_value": "$id"},
+        {"system_name": "f8", "type": "edtf", "selector_value": f"${pa[2]}"},
+        {
+            "system_name": "f9",
+            "type": "nested",
+            "base": f"$r_{r_id}",
+            "parts": {
+                "entity_type_name": "$entity_type_name",
+                "id": "$id",
+                "selector_value": f"${pb[0]} ${pb[2]}",
+            },
+            "display_not_available": True,
+        },
+        {
+            "system_name": "f10",
+            "type": "nested_multi_type",
+            "base": f"$r_{r_id}",
+            "parts": {
+                "entity_type_name": "$entity_type_name",
+                "id": "$id",
+                "selector_value": f"$display_name ${pb[1]}",
+            },
+        },
+        {
+            "system_name": "f11",
+            "type": "text",
+            "selector_value": f"${pa[3]}",
+            "display_not_available": True,
+        },
+        {"system_name": "f12", "type": "text", "selector_value": f"[$id] ${pa[3]}"},
+    ]
+
+    entities = {}
+    relation_id = 0
+    for entity_id in range(1, nr_of_entities + 1):
+        relations = {}
+        for _ in range(rnd.randint(0, 6)):
+            relation_id += 1
+            e_props = {
+                "id": 10000 + relation_id,
+                f"p_{dtu(pb[0])}": f"b0 '{relation_id}'",
+                f"p_{dtu(pb[1])}": f"b1 {relation_id}",
+            }
+            if rnd.random() < 0.5:
+                e_props[f"p_{dtu(pb[2])}"] = "x"
+            relations[relation_id] = {
+                "r_props": {"id": relation_id, f"p_{dtu(rp_id)}": f"rp{relation_id}"},
+                "e_props": e_props,
+                "entity_type_id": b_id,
+                "sources": [],
+            }
+        entity = {
+            "e_props": {
+                "id": entity_id,
+                f"p_{dtu(pa[0])}": f"name {entity_id}",
+                f"p_{dtu(pa[1])}": f"alt {entity_id}",
+                f"p_{dtu(pa[2])}": rnd.choice(
+                    YEAR_VALUES if years_only else EDTF_VALUES
+                ),
+            },
+        }
+        if relations:
+            entity["relations"] = {f"r_{r_id}": relations}
+        entities[entity_id] = entity
+
+    return (entity_types_config, es_data_config, entities)
+
+
+def measure(
+    base_elasticsearch: typing.Type,
+    entity_types_config: typing.Dict,
+    es_data_config: typing.List,
+    entities: typing.Dict,
+    repeat: int,
+) -> typing.Tuple[typing.Dict, float]:
+    """Convert the entities repeat times.
+
+    Returns:
+        typing.Tuple[typing.Dict, float]: The documents and the number of documents per second.
+    """
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        docs = base_elasticsearch.convert_entities_to_docs(
+            entity_types_config, es_data_config, entities
+        )
+    return (docs, repeat * len(entities) / (time.perf_counter() - start_time))
+
+
+app = typer.Typer(pretty_exceptions_show_locals=False)
+
+
+@app.command()
+def main(
+    baseline: str = typer.Option(
+        None, help="Git revision of app/es/base.py to measure as baseline"
+    ),
+    nr_of_entities: int = typer.Option(1000, help="Number of synthetic entities"),
+    repeat: int = typer.Option(5, help="Number of conversions of all entities"),
+    years_only: bool = typer.Option(False, help="Only use plain years as EDTF values"),
+):
+    (entity_types_config, es_data_config, entities) = synthetic_entities(
+        nr_of_entities, years_only
+    )
+
+    if baseline is not None:
+        (baseline_docs, baseline_docs_per_second) = measure(
+            load_baseline(baseline),
+            entity_types_config,
+            es_data_config,
+            entities,
+            repeat,
+        )
+        print(f"baseline ({baseline}): {baseline_docs_per_second:.0f} docs/s")
+
+    (docs, docs_per_second) = measure(
+        BaseElasticsearch,
+        entity_types_config,
+        es_data_config,
+        entities,
+        repeat,
+    )
+    print(f"current: {docs_per_second:.0f} docs/s")
+
+    if baseline is not None and docs != baseline_docs:
+        raise Exception("Documents differ from the baseline documents.")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,149 @@
+"""Measure the number of queries and latency of DataManager.update_es_query for an entity property modification.
+
+The Elasticsearch dependencies of the property are resolved both with a single query per entity type to update
+(batched, the current implementation) and with a query per relation path (per_path, the implementation before the paths
+of an entity type were combined in a single query). Only read queries are executed, the entity is not modified.
+
+Usage (with app/config.py pointing to a database containing the project):
+    python -m benchmarks.update_es_query <project_name> <entity_type_name> <entity_id> <property_name>...
+
+The query counts for a synthetic config are verified by tests/mgmt/test_data.py.
+"""
+import asyncio
+import statistics
+import time
+import typing
+import uuid
+
+import fastapi
+import starlette
+import typer
+
+from app.db.core import create_pool
+from app.mgmt.config import ConfigManager
+from app.mgmt.data import DataManager
+from app.models.auth import UserWithPermissions
+
+
+def per_path(find_entities_linked: typing.Callable) -> typing.Callable:
+    async def wrapper(*args) -> typing.List[typing.Set[int]]:
+        (*args, paths, connection) = args
+        results = []
+        for path in paths:
+            results.extend(await find_entities_linked(*args, [path], connection))
+        return results
+
+    return wrapper
+
+
+async def benchmark(
+    project_name: str,
+    entity_type_name: str,
+    entity_id: int,
+    property_names: typing.List[str],
+    repeat: int,
+):
+    app = fastapi.FastAPI()
+    app.state.pool = await create_pool()
+
+    try:
+        request = starlette.requests.Request(
+            {
+                "type": "http",
+                "app": app,
+                "path_params": {
+                    "project_name": project_name,
+                },
+            }
+        )
+        user = UserWithPermissions(
+            id=uuid.uuid4(),
+            username="benchmark",
+            permissions={},
+        )
+        config_manager = ConfigManager(request, user)
+        etipm = await config_manager.get_entity_type_i_property_mapping(
+            project_name, entity_type_name
+        )
+        diffs = [
+            ("change", etipm[property_name], (None, None))
+            for property_name in property_names
+        ]
+
+        for mode in ["batched", "per_path"]:
+            data_manager = DataManager(request, user)
+            data_repo = data_manager._data_repo
+            if mode == "per_path":
+                data_repo.find_entities_linked_to_entity = per_path(
+                    data_repo.find_entities_linked_to_entity
+                )
+
+            nr_of_queries = 0
+            fetch = data_repo.fetch
+
+            async def counting_fetch(*args, **kwargs):
+                nonlocal nr_of_queries
+                nr_of_queries += 1
+                return await fetch(*args, **kwargs)
+
+            data_repo.fetch = counting_fetch
+
+            latencies = []
+            async with data_repo.connection() as connection:
+                # The first run fills the config caches and is not measured
+                for i in range(repeat + 1):
+                    nr_of_queries = 0
+                    es_query = {}
+                    start_time = time.perf_counter()
+                    await data_manager.update_es_query(
+                        es_query,
+                        "entities",
+                        entity_type_name,
+                        entity_id,
+                        diffs,
+                        connection,
+                    )
+                    if i > 0:
+                        latencies.append(time.perf_counter() - start_time)
+
+            nr_of_entities = sum(
+                len(entities)
+                for entity_types in es_query.values()
+                for entities in entity_types.values()
+            )
+            print(
+                f"{mode}: {nr_of_queries} queries, "
+                f"{nr_of_entities} entities to update, "
+                f"median latency {statistics.median(latencies) * 1000:.1f} ms, "
+                f"max latency {max(latencies) * 1000:.1f} ms"
+            )
+    finally:
+        await app.state.pool.close()
+
+
+app = typer.Typer(pretty_exceptions_show_locals=False)
+
+
+@app.command()
+def main(
+    project_name: str,
+    entity_type_name: str,
+    entity_id: int,
+    property_names: typing.List[str],
+    repeat: int = typer.Option(20, help="Number of measured runs per mode"),
+):
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(
+        benchmark(
+            project_name,
+            entity_type_name,
+            entity_id,
+            property_names,
+            repeat,
+        )
+    )
+    loop.close()
+
+
+if __name__ == "__main__":
+    app()
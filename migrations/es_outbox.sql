@@ -0,0 +1,27 @@
+-- Elasticsearch updates to be applied by the outbox workers (app/mgmt/outbox.py)
+CREATE TABLE IF NOT EXISTS app.es_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    project_name TEXT NOT NULL,
+    es_query JSONB NOT NULL,
+    created TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    -- Failed attempts to apply the updates, rows are retried with an exponential backoff
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    -- Set when the maximum number of attempts has been reached, these rows are no longer processed
+    dead_lettered TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS es_outbox_pending_idx
+    ON app.es_outbox (project_name, id)
+    WHERE dead_lettered IS NULL;
+
+-- Rows are moved to the dead-letter state after a number of failed attempts (OUTBOX_MAX_ATTEMPTS in
+-- app/mgmt/outbox.py). Attempts failing because Elasticsearch is unavailable are not counted.
+-- Inspect dead-lettered rows:
+--   SELECT id, project_name, attempts, last_error, dead_lettered FROM app.es_outbox WHERE dead_lettered IS NOT NULL;
+-- After fixing the cause, re-queue them (all, or filtered by project_name / id):
+--   UPDATE app.es_outbox SET attempts = 0, last_error = NULL, next_attempt = NOW(), dead_lettered = NULL
+--   WHERE dead_lettered IS NOT NULL;
+--   NOTIFY es_outbox;
+-- Alternatively, reindex the affected entity types (app/cmd/elasticsearch_reindex.py) and delete the rows.
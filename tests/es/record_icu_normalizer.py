@@ -0,0 +1,57 @@
+"""Record the tokens of the icu_normalizer in tests/es/fixtures/icu_normalizer.json.
+
+An index is created with the settings of BaseElasticsearch.create_new_index, the texts in the fixture are analyzed using
+GET <index>/_analyze {"normalizer": "icu_normalizer", "text": <text>} and the index is deleted again.
+Add a case by adding its text to the fixture (with token null) and recording again.
+
+Usage (with app/config.py pointing to an Elasticsearch cluster with the analysis-icu plugin):
+    python -m tests.es.record_icu_normalizer
+"""
+import asyncio
+import json
+import pathlib
+
+import elasticsearch
+
+from app.config import ELASTICSEARCH
+from app.es.base import BaseElasticsearch
+
+FIXTURE = pathlib.Path(__file__).parent / "fixtures" / "icu_normalizer.json"
+
+
+async def record() -> None:
+    with open(FIXTURE) as f:
+        fixture = json.load(f)
+
+    es = elasticsearch.AsyncElasticsearch(**ELASTICSEARCH)
+    try:
+        version = (await es.info())["version"]["number"]
+        index_name = await BaseElasticsearch(es).create_new_index([])
+        try:
+            for case in fixture["tokens"]:
+                response = await es.indices.analyze(
+                    index=index_name,
+                    body={
+                        "normalizer": "icu_normalizer",
+                        "text": case["text"],
+                    },
+                )
+                # No token is returned for an empty text
+                tokens = [token["token"] for token in response["tokens"]]
+                case["token"] = tokens[0] if tokens else ""
+        finally:
+            await es.indices.delete(index=index_name)
+    finally:
+        await es.close()
+
+    fixture["source"] = (
+        "Recorded using python -m tests.es.record_icu_normalizer "
+        f"against Elasticsearch {version}."
+    )
+    with open(FIXTURE, "w") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=4)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(record())
@@ -0,0 +1,23 @@
+import json
+import pathlib
+
+import pytest
+
+from app.es.base import BaseElasticsearch
+
+# Tokens of the icu_normalizer of an index created by BaseElasticsearch.create_new_index, see the source in the fixture.
+# Record them again after modifying the index settings or upgrading Elasticsearch (tests/es/record_icu_normalizer.py).
+with open(pathlib.Path(__file__).parent / "fixtures" / "icu_normalizer.json") as f:
+    ICU_NORMALIZER_TOKENS = [
+        (case["text"], case["token"]) for case in json.load(f)["tokens"]
+    ]
+
+
+@pytest.mark.parametrize("value,token", ICU_NORMALIZER_TOKENS)
+def test_normalize(value, token):
+    normalized = BaseElasticsearch.normalize(value)
+    # None: the value can't be normalized locally, the normalizer of Elasticsearch has to be used
+    if normalized is None:
+        assert not value.isascii()
+    else:
+        assert normalized == token
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import typing
+import uuid
+
+import pytest
+
+from app.db.data import DataRepository
+from app.mgmt.config import ConfigManager
+from app.mgmt.data import DataManager
+from app.utils import dtu
+
+
+def dumped(es_query):
+    # Outbox rows are stored as JSON, so entity ids become strings
+    return json.loads(json.dumps(DataManager.dump_es_query(es_query)))
+
+
+MERGE_ES_QUERIES = [
+    (
+        "single update",
+        [{"update": {"et": {1: {"a"}}}}],
+        {"update": {"et": {1: {"a"}}}},
+    ),
+    (
+        "field set union",
+        [{"update": {"et": {1: {"a"}}}}, {"update": {"et": {1: {"b"}, 2: {"c"}}}}],
+        {"update": {"et": {1: {"a", "b"}, 2: {"c"}}}},
+    ),
+    (
+        "delete after update",
+        [{"update": {"et": {1: {"a"}}}}, {"delete": {"et": {1: set()}}}],
+        {"delete": {"et": {1: set()}}},
+    ),
+    (
+        "update after delete",
+        [{"delete": {"et": {1: set()}}}, {"update": {"et": {1: {"a"}}}}],
+        {"delete": {"et": {1: set()}}},
+    ),
+    (
+        "update after index",
+        [{"index": {"et": {1: {"a"}}}}, {"update": {"et": {1: {"b"}}}}],
+        {"index": {"et": {1: {"a", "b"}}}},
+    ),
+    (
+        "index after update",
+        [{"update": {"et": {1: {"a"}}}}, {"index": {"et": {1: {"b"}}}}],
+        {"index": {"et": {1: {"a", "b"}}}},
+    ),
+    (
+        "index after delete",
+        [{"delete": {"et": {1: set()}}}, {"index": {"et": {1: {"a"}}}}],
+        {"delete": {"et": {1: set()}}},
+    ),
+    (
+        "entity types are kept apart",
+        [{"update": {"et1": {1: {"a"}}}}, {"delete": {"et2": {1: set()}}}],
+        {"update": {"et1": {1: {"a"}}}, "delete": {"et2": {1: set()}}},
+    ),
+    (
+        "empty",
+        [{}],
+        {},
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "es_queries,expected",
+    [(es_queries, expected) for (_, es_queries, expected) in MERGE_ES_QUERIES],
+    ids=[name for (name, _, _) in MERGE_ES_QUERIES],
+)
+def test_merge_es_queries(es_queries, expected):
+    assert (
+        DataManager.merge_es_queries([dumped(es_query) for es_query in es_queries])
+        == expected
+    )
+
+
+def test_dump_es_query():
+    assert DataManager.dump_es_query({"update": {"et": {1: {"b", "a"}}}}) == {
+        "update": {"et": {1: ["a", "b"]}}
+    }
+
+
+class CountingDataRepository(DataRepository):
+    """Data repository recording the queries instead of executing them.
+
+    Every path in a query finds a single entity, with id 1000 + the index of the path.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(None)
+        self.queries = []
+
+    async def fetch(self, query, *args, **kwargs):
+        self.queries.append(query)
+        return [
+            {"path": index, "id": str(1000 + index)}
+            for index in range(query.count("ag_catalog.cypher("))
+        ]
+
+
+class SyntheticConfigManager(ConfigManager):
+    def __init__(self, entity_types_config: typing.Dict) -> None:
+        self._entity_types_config = entity_types_config
+
+    async def get_entity_types_config(self, project_name, connection=None):
+        return self._entity_types_config
+
+
+def synthetic_entity_types_config(
+    nr_of_entity_types: int, nr_of_fields: int
+) -> typing.Tuple[str, str, typing.Dict]:
+    """Create a config in which a property of a person is used by nr_of_fields fields of nr_of_entity_types other
+    entity types, using a different relation path for each field.
+
+    Returns:
+        typing.Tuple[str, str, typing.Dict]: The person entity type id, the person name property id and the config.
+    """
+    person_id = str(uuid.uuid4())
+    name_id = str(uuid.uuid4())
+    config = {
+        "person": {
+            "id": person_id,
+            "config": {
+                "es_data": {
+                    "fields": [
+                        {
+                            "system_name": "name",
+                            "type": "text",
+                            "selector_value": f"${name_id}",
+                        },
+                    ],
+                },
+            },
+        },
+    }
+    for i in range(nr_of_entity_types):
+        config[f"type_{i}"] = {
+            "id": str(uuid.uuid4()),
+            "config": {
+                "es_data": {
+                    "fields": [
+                        {
+                            "system_name": f"field_{j}",
+                            "type": "text",
+                            "selector_value": (
+                                "->".join(
+                                    f"$r_{uuid.uuid4()}" for _ in range(j % 3 + 1)
+                                )
+                                + f"->${name_id}"
+                            ),
+                        }
+                        for j in range(nr_of_fields)
+                    ],
+                },
+            },
+        }
+    return (person_id, name_id, config)
+
+
+@pytest.mark.parametrize(
+    "nr_of_entity_types,nr_of_fields",
+    [(1, 1), (1, 10), (5, 1), (5, 10)],
+)
+def test_update_es_query_single_query_per_entity_type(nr_of_entity_types, nr_of_fields):
+    (person_id, name_id, config) = synthetic_entity_types_config(
+        nr_of_entity_types, nr_of_fields
+    )
+    data_manager = DataManager.__new__(DataManager)
+    # Configs are cached by project name
+    data_manager._project_name = f"synthetic_{uuid.uuid4()}"
+    data_manager._project_id = str(uuid.uuid4())
+    data_manager._config_manager = SyntheticConfigManager(config)
+    data_manager._data_repo = CountingDataRepository()
+
+    es_query = {}
+    asyncio.run(
+        data_manager.update_es_query(
+            es_query,
+            "entities",
+            "person",
+            1,
+            [("change", f"p_{dtu(name_id)}", ("old", "new"))],
+            None,
+        )
+    )
+
+    # One query for each entity type using the modified property, resolving all its paths
+    queries = data_manager._data_repo.queries
+    assert len(queries) == nr_of_entity_types
+    for query in queries:
+        assert query.count("ag_catalog.cypher(") == nr_of_fields
+    assert es_query == {
+        "update": {
+            person_id: {1: {"name"}},
+            **{
+                config[f"type_{i}"]["id"]: {
+                    1000 + j: {f"field_{j}"} for j in range(nr_of_fields)
+                }
+                for i in range(nr_of_entity_types)
+            },
+        }
+    }